@@ -1,11 +1,18 @@
-from contextlib import contextmanager
+from contextlib import closing, contextmanager
+from functools import lru_cache
 import os
 from pathlib import PurePath as PP
 import sqlite3 as sql
-from typing import Optional, Union, Generator, List
+from typing import FrozenSet, Optional, Union, Generator, List
 
 from lib.model.dir import Dir
 
+TABLE_EXISTS_QUERY = (
+    "SELECT 1 FROM sqlite_master WHERE type='table' AND name=? LIMIT 1;"
+)
+# Path that makes a DBConnector keep its database in memory instead of a file
+MEMORY_PATH = ":memory:"
+
 
 class DBConnectorError(Exception):
     """Base class for DBConnector errors."""
@@ -77,6 +84,53 @@ class DBPathNotSupportedError(DBConnectorError):
         super().__init__(self.message)
 
 
+@lru_cache(maxsize=8192)
+def normalize_to_root(root: PP, path: str) -> PP:
+    """
+    Normalize a path relative to a root directory, see DBConnector.normalize_path.
+    Memoized on (root, path) so repeated walks over the same paths,
+    even across DBConnector instances, skip the pathlib arithmetic.
+    Errors aren't cached, they're raised again on every call.
+    Args:
+        root (PurePath): The root directory paths are normalized to.
+        path (str): The path to normalize.
+    Returns:
+        PP: The normalized PurePath relative to the root directory.
+    Raises:
+        DBPathNotSupportedError: If unsupported (..) syntax in path
+        DBPathOutsideTargetError: If the path is not relative to repo target.
+    """
+    # Check for unresolvable path syntax
+    if ".." in str(path):
+        raise DBPathNotSupportedError(path)
+    # Coerce to PP type
+    path = PP(path)
+
+    # If relative prepend the root so we can use pathlib's relative_to
+    if not path.is_absolute():
+        path = root / path
+    try:  # Check for paths outside target when conducting relative_to
+        path = path.relative_to(root)  # Finally normalize
+    except ValueError as e:
+        raise DBPathOutsideTargetError(path, root) from e
+    return path
+
+
+@lru_cache(maxsize=8192)
+def join_root(root: PP, path: str) -> PP:
+    """
+    Join an already normalized path string onto a root directory.
+    PurePaths are immutable, so the memo hands every caller denormalizing
+    the same (root, path) one shared instance instead of a new one each time.
+    Args:
+        root (PurePath): The root directory to join onto.
+        path (str): The normalized path to join.
+    Returns:
+        PP: The joined PurePath.
+    """
+    return root / path
+
+
 class DBConnector:
     """
     A class for managing connections to a scout database file and
@@ -86,6 +140,9 @@ class DBConnector:
 
     path: PP  # Path to the db file
     root: PP  # Path to the relative root of the db paths inside repos
+    mem_conn: Optional[sql.Connection] = None  # The one connection of in-memory dbs
+    # Tables seen to exist, scout never drops tables so a hit needs no query
+    known_tables: FrozenSet[str] = frozenset()
 
     @classmethod
     def is_db_file(cls, path) -> bool:
@@ -115,17 +172,13 @@ class DBConnector:
         """
         if not cls.is_db_file(path):
             return False
-        with sql.connect(path) as conn:
+        with closing(sql.connect(path)) as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [t[0] for t in cursor.fetchall()]
-            if "fs_meta" not in tables:
+            cursor.execute(TABLE_EXISTS_QUERY, ("fs_meta",))
+            if cursor.fetchone() is None:
                 return False
-            cursor.execute("SELECT property FROM fs_meta;")
-            for row in cursor.fetchall():
-                if row[0] == "root":
-                    return True
-            return False
+            cursor.execute("SELECT 1 FROM fs_meta WHERE property='root' LIMIT 1;")
+            return cursor.fetchone() is not None
 
     @classmethod
     def validate_arg_path(cls, path: Union[PP, str]) -> PP:
@@ -206,12 +259,11 @@ class DBConnector:
             DBNoFsMetaTableError: fs_meta table is missing from the database.
             DBTargetPropMissingError: target property is not in the fs_meta table.
         """
-        with sql.connect(path) as conn:
+        with closing(sql.connect(path)) as conn:
             c = conn.cursor()
             # Check if fs_meta table exists
-            c.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = c.fetchall()
-            if ("fs_meta",) not in tables:
+            c.execute(TABLE_EXISTS_QUERY, ("fs_meta",))
+            if c.fetchone() is None:
                 raise DBNoFsMetaTableError()
             c.execute("SELECT value FROM fs_meta WHERE property='root';")
             res = c.fetchone()
@@ -228,13 +280,24 @@ class DBConnector:
             path (PP): The path to the database file.
             root (PP): The root directory path to store in the fs_meta table.
         """
-        with sql.connect(path) as conn:
-            conn.execute("""CREATE TABLE IF NOT EXISTS fs_meta (
-                            property TEXT PRIMARY KEY, value TEXT);""")
-            conn.execute(
-                f"INSERT INTO fs_meta (property, value) VALUES ('root', '{root}');"
-            )
-            conn.commit()
+        with closing(sql.connect(path)) as conn:
+            cls.init_fs_meta(conn, root)
+
+    @classmethod
+    def init_fs_meta(cls, conn: sql.Connection, root: PP) -> None:
+        """
+        Create the fs_meta table and store the root in it on an open connection.
+
+        Args:
+            conn (sql.Connection): The connection to the database to initialize.
+            root (PP): The root directory path to store in the fs_meta table.
+        """
+        conn.execute("""CREATE TABLE IF NOT EXISTS fs_meta (
+                        property TEXT PRIMARY KEY, value TEXT);""")
+        conn.execute(
+            f"INSERT INTO fs_meta (property, value) VALUES ('root', '{root}');"
+        )
+        conn.commit()
 
     def __init__(
         self, path: Union[PP, str], root: Optional[Union[PP, str]] = None
@@ -243,12 +306,23 @@ class DBConnector:
         Initialize the DBConnector with the given path and root.
 
         Args:
-            path (Union[PP, str]): The path to the database file.
+            path (Union[PP, str]): The path to the database file,
+                or MEMORY_PATH for a database that only lives in memory.
             root (Optional[Union[PP, str]]): The root directory path.
 
         Raises:
             ValueError: If the path exists but is not a scout database file.
+            TypeError: If an in-memory database is given no root.
         """
+        if str(path) == MEMORY_PATH:
+            # Nothing on disk to default or read the root from, so it's required
+            if root is None:
+                raise TypeError(f"root is required for a {MEMORY_PATH} database")
+            self.path = PP(MEMORY_PATH)
+            self.root = self.validate_arg_root(self.path, root)
+            self.mem_conn = sql.connect(MEMORY_PATH)
+            self.init_fs_meta(self.mem_conn, self.root)
+            return
         self.path = self.validate_arg_path(path)
         self.root = self.validate_arg_root(self.path, root)
 
@@ -259,7 +333,51 @@ class DBConnector:
         else:
             raise DBFileOccupiedError(str(self.path))
 
+    @classmethod
+    def from_connection(
+        cls, conn: sql.Connection, root: Union[PP, str]
+    ) -> "DBConnector":
+        """
+        Wrap an open connection to an in-memory scout database,
+        e.g. one filled from another with sql.Connection.backup.
+        The connector takes over the connection, close closes it.
+
+        Args:
+            conn (sql.Connection): Connection to a db that already has fs_meta.
+            root (Union[PP, str]): The root directory path of the db.
+
+        Returns:
+            DBConnector: An in-memory connector handing out conn.
+        """
+        db = cls.__new__(cls)
+        db.path = PP(MEMORY_PATH)
+        db.root = cls.validate_arg_root(db.path, root)
+        db.mem_conn = conn
+        return db
+
     ### Path Utility Methods
+    @staticmethod
+    def is_normalized(path: Union[Dir, PP, str]) -> bool:
+        """
+        Cheaply check if a path string is already in the form normalize_path returns.
+        That is a relative path with no empty or '.' components & no '..' anywhere,
+        since normalize_path rejects any '..' substring, not just '..' components.
+        Args:
+            path (Union[Dir, PurePath, str]): The path to check.
+        Returns:
+            bool: True only for str paths normalize_path would return unchanged.
+        """
+        if not isinstance(path, str) or path == "":
+            return False
+        if path[0] == "/" or path[-1] == "/" or "//" in path:
+            return False
+        # Substring scans run in C, only dotted paths need the component check
+        if "." not in path:
+            return True
+        if ".." in path:
+            return False
+        return "/./" not in f"/{path}/"
+
     def normalize_path(self, denormalized_path: Union[Dir, PP, str]) -> PP:
         """
         Normalize a path relative to the root directory this database tracks.
@@ -273,28 +391,15 @@ class DBConnector:
             DBPathNotSupportedError: If unsupported (..) syntax in path
             DBPathOutsideTargetError: If the path is not relative to repo target.
         """
-        # Check for unresolvable path syntax
-        if ".." in str(denormalized_path):
-            raise DBPathNotSupportedError(denormalized_path)
-        # Coerce to PP type
-        path = None
+        # Already normalized strings need no pathlib round trip
+        if self.is_normalized(denormalized_path):
+            return PP(denormalized_path)
         if isinstance(denormalized_path, Dir):
-            path = denormalized_path.path
-        elif isinstance(denormalized_path, str):
-            path = PP(denormalized_path)
-        elif isinstance(denormalized_path, PP):
-            path = denormalized_path
-        else:
+            denormalized_path = denormalized_path.path
+        if not isinstance(denormalized_path, (str, PP)):
             raise TypeError(f"path {denormalized_path} must be a Dir, PurePath or str")
-
-        # If relative prepend the root so we can use pathlib's relative_to
-        if not path.is_absolute():
-            path = self.root / path
-        try:  # Check for paths outside target when conducting relative_to
-            path = path.relative_to(self.root)  # Finally normalize
-        except ValueError as e:
-            raise DBPathOutsideTargetError(path, self.root) from e
-        return path
+        # Key the memo on str so equal str & PurePath inputs share an entry
+        return normalize_to_root(self.root, str(denormalized_path))
 
     def denormalize_path(self, normalized_path: Union[PP, str]) -> PP:
         """
@@ -308,6 +413,9 @@ class DBConnector:
             DBPathNotSupportedError: If unsupported (..) syntax in path
             DBPathOutsideTargetError: If the path is not relative to repo target.
         """
+        # Stored paths are already normalized strings, join them straight on root
+        if self.is_normalized(normalized_path):
+            return join_root(self.root, normalized_path)
         if ".." in str(normalized_path):
             raise DBPathNotSupportedError(normalized_path)
         path = PP(normalized_path)
@@ -328,20 +436,56 @@ class DBConnector:
         Yields:
             PP: The ancestor paths of the given path ordered from root to path.
         """
-        current = self.normalize_path(path)
+        return [PP(ap) for ap in self.ancestor_path_strs(path)]
+
+    def ancestor_path_strs(self, path: Union[PP, str]) -> List[str]:
+        """
+        Generate all ancestor paths of a given path as normalized strings.
+        Walks the '/' separators of the normalized string
+        instead of building a PurePath for every parent.
+        Args:
+            path (Union[PurePath, str]): The path to generate ancestors of.
+        Returns:
+            List[str]: The ancestor paths of the given path ordered from root to path.
+        """
+        current = str(self.normalize_path(path))
+        if current == str(PP()):
+            return []
         ancestors = []
-        while current != PP():
-            ancestors.append(current)
-            current = current.parent
-        return ancestors[::-1]
+        i = current.find("/")
+        while i != -1:
+            ancestors.append(current[:i])
+            i = current.find("/", i + 1)
+        ancestors.append(current)
+        return ancestors
 
     ### Connect methods
-    # TODO: Come up with way to close cleanly if leaks are a concern
     @contextmanager
     def connect(self) -> Generator[sql.Connection, None, None]:
-        """"""
-        with sql.connect(self.path) as conn:
-            yield conn
+        """
+        Open a connection to the database file for the span of a with block.
+        The sqlite3 connection context only commits or rolls back,
+        so the connection is explicitly closed on exit to avoid leaking FDs.
+        In-memory databases only live as long as their one connection,
+        so that is handed out every time and left open until close.
+        Yields:
+            sql.Connection: The open connection to the database file.
+        """
+        if self.mem_conn is not None:
+            with self.mem_conn:
+                yield self.mem_conn
+            return
+        conn = sql.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        """Close the connection of an in-memory database, discarding it."""
+        if self.mem_conn is not None:
+            self.mem_conn.close()
 
     def table_exists(self, table_name: str) -> bool:
         """
@@ -351,8 +495,12 @@ class DBConnector:
         Returns:
             bool: True if the table exists, False otherwise.
         """
+        if table_name in self.known_tables:
+            return True
         with self.connect() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            return (table_name,) in tables
+            cursor.execute(TABLE_EXISTS_QUERY, (table_name,))
+            exists = cursor.fetchone() is not None
+        if exists:
+            self.known_tables = self.known_tables | {table_name}
+        return exists
@@ -7,18 +7,80 @@
 # NOTE: The way we handle query building is messy, consider a query builder & refactor
 # TODO: Ensure docstrings are on every method
 # TODO: Refactor to use DBConnector instead of path and root & remove methods from it.
+from contextlib import contextmanager
+import json
 import sqlite3
 from pathlib import PurePath as PP
-from typing import Optional, Union, List, Tuple
+from typing import Dict, Iterable, Iterator, Optional, Union, List, Tuple
 
 from lib.model.dir import Dir
 from lib.handler.db_connector import DBConnector as DBC
 
-
 DIR_TABLE = "dir"
 DIR_ANCESTOR_TABLE = "dir_ancestor"
+DIR_ANCESTOR_INDEX = "dir_ancestor_ancestor_depth"
+DIR_ANCESTOR_DIR_INDEX = "dir_ancestor_dir_depth"
 DEFAULT_DEPTH = 2**31 - 1
 
+# Query text is kept constant & parameterized so each connection's
+# statement cache can reuse the prepared statement instead of reparsing it.
+SELECT_DIR_WHERE_PATH = "SELECT * FROM dir WHERE path = ?"
+SELECT_DIR_WHERE_ID = "SELECT * FROM dir WHERE id = ?"
+SELECT_ANCESTORS_WHERE_PATH = """
+    SELECT ancestor_dirs.*
+    FROM dir target_dir
+    JOIN dir_ancestor da ON da.dir_id = target_dir.id
+    JOIN dir ancestor_dirs ON ancestor_dirs.id = da.ancestor_id
+    WHERE target_dir.path = ? AND da.depth BETWEEN 1 AND ?
+    ORDER BY da.depth
+"""
+SELECT_ANCESTORS_WHERE_ID = """
+    SELECT ancestor_dirs.*
+    FROM dir target_dir
+    JOIN dir_ancestor da ON da.dir_id = target_dir.id
+    JOIN dir ancestor_dirs ON ancestor_dirs.id = da.ancestor_id
+    WHERE target_dir.id = ? AND da.depth BETWEEN 1 AND ?
+    ORDER BY da.depth
+"""
+SELECT_DESCENDANTS_WHERE_PATH = """
+    SELECT descendant_dirs.*
+    FROM dir target_dir
+    JOIN dir_ancestor da ON da.ancestor_id = target_dir.id
+    JOIN dir descendant_dirs ON descendant_dirs.id = da.dir_id
+    WHERE target_dir.path = ? AND da.depth BETWEEN 1 AND ?
+    ORDER BY da.depth, descendant_dirs.id
+"""
+SELECT_DESCENDANTS_WHERE_ID = """
+    SELECT descendant_dirs.*
+    FROM dir target_dir
+    JOIN dir_ancestor da ON da.ancestor_id = target_dir.id
+    JOIN dir descendant_dirs ON descendant_dirs.id = da.dir_id
+    WHERE target_dir.id = ? AND da.depth BETWEEN 1 AND ?
+    ORDER BY da.depth, descendant_dirs.id
+"""
+# Closure rows that already exist are skipped rather than raising
+INSERT_DIR_ANCESTOR = """
+    INSERT INTO dir_ancestor (dir_id, ancestor_id, depth)
+    VALUES (?, ?, ?) ON CONFLICT DO NOTHING
+"""
+# Many ids are bound as one JSON array so the text stays the same for any count
+SELECT_ANCESTORS_WHERE_IDS = """
+    SELECT da.dir_id, ancestor_dirs.*
+    FROM dir_ancestor da
+    JOIN dir ancestor_dirs ON da.ancestor_id = ancestor_dirs.id
+    WHERE da.dir_id IN (SELECT value FROM json_each(?))
+        AND da.depth BETWEEN 1 AND ?
+    ORDER BY da.dir_id, da.depth
+"""
+SELECT_DESCENDANTS_WHERE_IDS = """
+    SELECT da.ancestor_id, descendant_dirs.*
+    FROM dir_ancestor da
+    JOIN dir descendant_dirs ON da.dir_id = descendant_dirs.id
+    WHERE da.ancestor_id IN (SELECT value FROM json_each(?))
+        AND da.depth BETWEEN 1 AND ?
+    ORDER BY da.ancestor_id, da.depth, descendant_dirs.id
+"""
+
 
 class DirRepo:
     """
@@ -27,6 +89,19 @@ class DirRepo:
     """
 
     db: DBC
+    # Whether gets are inside a cached() block & may memoize their results
+    _caching: bool
+    # Memoized get_ancestors results as (id, denormalized path) pairs,
+    # keyed by (id, depth) or (normalized path, depth) of the queried dir.
+    _anc_cache: dict[tuple[int, int], list[tuple[int, PP]]]
+    _anc_path_cache: dict[tuple[str, int], list[tuple[int, PP]]]
+    # Memoized get_descendants results as (id, normalized path) rows,
+    # keyed the same way, denormalized only once iterated to.
+    _desc_cache: dict[tuple[int, int], list[tuple[int, str]]]
+    _desc_path_cache: dict[tuple[str, int], list[tuple[int, str]]]
+    # Lazily loaded top-level dir ids mapped to their normalized paths & back
+    _l1: Optional[dict[int, str]]
+    _l1_ids_by_path: dict[str, int]
 
     @classmethod
     def create_dir_table(cls, db: DBC):
@@ -45,7 +120,8 @@ class DirRepo:
     @classmethod
     def create_dir_ancestor_table(cls, db: DBC):
         """
-        Create the dir_ancestor table in the database.
+        Create the dir_ancestor table in the database,
+        along with covering indices for descendant & ancestor lookups.
         """
         query = """CREATE TABLE IF NOT EXISTS dir_ancestor (
                         dir_id INTEGER NOT NULL,
@@ -55,17 +131,135 @@ class DirRepo:
                         FOREIGN KEY (dir_id) REFERENCES dir(id),
                         FOREIGN KEY (ancestor_id) REFERENCES dir(id)
         );"""
+        # Lookups go by one end of the closure bounded by depth & only need
+        # the other end, so each index holds all three columns & the rows
+        # never have to be read. The primary key alone lacks depth.
+        query_index = f"""CREATE INDEX IF NOT EXISTS {DIR_ANCESTOR_INDEX}
+                        ON dir_ancestor (ancestor_id, depth, dir_id);"""
+        query_dir_index = f"""CREATE INDEX IF NOT EXISTS {DIR_ANCESTOR_DIR_INDEX}
+                        ON dir_ancestor (dir_id, depth, ancestor_id);"""
         with db.connect() as conn:
             conn.execute(query)
+            conn.execute(query_index)
+            conn.execute(query_dir_index)
             conn.commit()
 
     def __init__(self, db_connector: DBC):
         self.db = db_connector
+        self._caching = False
+        self._anc_cache = {}
+        self._anc_path_cache = {}
+        self._desc_cache = {}
+        self._desc_path_cache = {}
+        self._l1 = None
+        self._l1_ids_by_path = {}
         if not self.db.table_exists(DIR_TABLE):
             self.create_dir_table(self.db)
         if not self.db.table_exists(DIR_ANCESTOR_TABLE):
             self.create_dir_ancestor_table(self.db)
 
+    #  ### Cache Helper Methods ###
+
+    @contextmanager
+    def cached(self) -> Iterator["DirRepo"]:
+        """
+        Memoizes get_ancestors & get_descendants results for the span of a with block,
+        e.g. a bulk pass reading the ancestors of many dirs.
+        Outside of a block every get reads the db, nested blocks share the outer one.
+        NOTE: Writes through this DirRepo still invalidate the memo inside a block,
+        but writes by other DirRepos or processes aren't seen until it exits.
+
+        Yields:
+            DirRepo: This DirRepo.
+        """
+        if self._caching:
+            yield self
+            return
+        self._caching = True
+        try:
+            yield self
+        finally:
+            self._caching = False
+            self.invalidate_ancestors()
+            self.invalidate_descendants()
+
+    def invalidate_ancestors(self) -> None:
+        """
+        Clears the memoized get_ancestors results.
+        Called by the insert helpers whenever dir or dir_ancestor rows are written,
+        since a new dir can turn a previously empty lookup into a hit.
+        NOTE: Writes made outside this DirRepo instance won't invalidate it,
+        which is why the memo only lives as long as a cached() block.
+        """
+        self._anc_cache.clear()
+        self._anc_path_cache.clear()
+
+    def invalidate_descendants(self) -> None:
+        """
+        Clears the memoized get_descendants results.
+        Called by the insert helpers whenever dir or dir_ancestor rows are written.
+        NOTE: Writes made outside this DirRepo instance won't invalidate it,
+        which is why the memo only lives as long as a cached() block.
+        """
+        self._desc_cache.clear()
+        self._desc_path_cache.clear()
+
+    def invalidate_top_level(self) -> None:
+        """
+        Drops the top-level dir cache so the next top_level_dirs reloads it.
+        Only insert_dir of a path with no parent calls this,
+        deeper inserts can't change the top level.
+        """
+        self._l1 = None
+        self._l1_ids_by_path = {}
+
+    def top_level_dirs(self) -> dict[int, str]:
+        """
+        Returns the ids of every top-level dir mapped to its normalized path.
+        Loaded on first access and kept until a new top-level dir is inserted,
+        top-level dirs have no ancestors and terminate every ancestor chain.
+
+        Returns:
+            Dict[int, str]: Top-level dir ids mapped to their normalized paths.
+        """
+        if self._l1 is None:
+            query = "SELECT id, path FROM dir WHERE instr(path, '/') = 0"
+            with self.db.connect() as conn:
+                self._l1 = dict(conn.execute(query))
+            self._l1_ids_by_path = {path: id for id, path in self._l1.items()}
+        return self._l1
+
+    #  ### Lookup Helper Methods ###
+
+    @staticmethod
+    def resolve_lookup(
+        id: Optional[int] = None,
+        path: Optional[Union[PP, str]] = None,
+        dir: Optional[Dir] = None,
+    ) -> Tuple[Optional[int], Optional[Union[PP, str]]]:
+        """
+        Resolves the id > path > dir argument priority the get methods share.
+        The first argument given wins, a dir contributes both its id and path.
+
+        Args:
+            id (Optional[int]): The directory ID.
+            path (Optional[Union[PP, str]]): The directory path.
+            dir (Optional[Dir]): The directory object.
+
+        Returns:
+            Tuple[Optional[int], Optional[Union[PP, str]]]: The id and path to look up by.
+
+        Raises:
+            ValueError: If none of the arguments are given.
+        """
+        if id is not None:
+            return id, None
+        if path is not None:
+            return None, path
+        if dir is not None:
+            return dir.id, dir.path
+        raise ValueError("Must provide either id, path, or dir argument.")
+
     #  ### SQL Query Helper Methods ###
 
     # TODO: Benchmark this, no server so latency not a concern, but could be slow
@@ -79,19 +273,71 @@ class DirRepo:
         Returns:
             Optional[int]: The ID of the new record if added, otherwise None.
         """
-        np = self.db.normalize_path(path)
+        np = path if self.db.is_normalized(path) else str(self.db.normalize_path(path))
         id = None
         query_id = "SELECT id FROM dir WHERE path = ?"
         query_insert = "INSERT INTO dir (path) VALUES (?)"
         with self.db.connect() as conn:
             cursor = conn.cursor()
-            cursor.execute(query_id, (str(np),))
+            cursor.execute(query_id, (np,))
             id = cursor.fetchone()
             if id:  # If it exists it's a duplicate just return the id
                 return id[0]
-            cursor.execute(query_insert, (str(np),))
+            cursor.execute(query_insert, (np,))
+            if "/" not in np:
+                self.invalidate_top_level()
+            self.invalidate_ancestors()
+            self.invalidate_descendants()
             return cursor.lastrowid
 
+    @staticmethod
+    def insert_dir_paths(
+        conn: sqlite3.Connection, paths: Iterable[str]
+    ) -> Dict[str, int]:
+        """
+        Inserts every normalized path not yet in the 'dir' table on an open connection.
+        Only new paths get inserted, conflicting inserts would still use up an id.
+
+        Args:
+            conn (sqlite3.Connection): The connection to insert with.
+            paths (Iterable[str]): Normalized paths, duplicates are allowed.
+
+        Returns:
+            Dict[str, int]: The id of every given path, new or already present.
+        """
+        ids = {}
+        new_paths = []
+        for path in dict.fromkeys(paths):
+            row = conn.execute(SELECT_DIR_WHERE_PATH, (path,)).fetchone()
+            if row:
+                ids[path] = row[0]
+            else:
+                new_paths.append(path)
+        conn.executemany("INSERT INTO dir (path) VALUES (?)", ((p,) for p in new_paths))
+        for path in new_paths:
+            ids[path] = conn.execute(SELECT_DIR_WHERE_PATH, (path,)).fetchone()[0]
+        return ids
+
+    def insert_dirs(self, paths: Iterable[Union[PP, str]]) -> List[int]:
+        """
+        Inserts many records into the 'dir' table in a single transaction.
+        Same result as calling insert_dir on each path in order.
+
+        Args:
+            paths (Iterable[Union[PP, str]]): The directory paths to insert.
+
+        Returns:
+            List[int]: The ID of each given path's record, new or already present.
+        """
+        is_norm, norm = self.db.is_normalized, self.db.normalize_path
+        nps = [p if is_norm(p) else str(norm(p)) for p in paths]
+        with self.db.connect() as conn:
+            ids = self.insert_dir_paths(conn, nps)
+        self.invalidate_top_level()
+        self.invalidate_ancestors()
+        self.invalidate_descendants()
+        return [ids[np] for np in nps]
+
     def insert_dir_ancestor(self, dir_ancestor_rows: list[tuple[int, int, int]]):
         """
         Inserts multiple records into the 'dir_ancestor' table.
@@ -100,22 +346,16 @@ class DirRepo:
             dir_ancestor_rows (List[Tuple[int, int, int]]): List of tuples containing dir_id, ancestor_id, and depth.
         """
         with self.db.connect() as conn:
-            c = conn.cursor()
-            for row in dir_ancestor_rows:
-                c.execute(
-                    """INSERT INTO dir_ancestor (dir_id, ancestor_id, depth)
-                    VALUES (?, ?, ?) ON CONFLICT DO NOTHING""",
-                    row,
-                )
-            conn.commit()
+            conn.executemany(INSERT_DIR_ANCESTOR, dir_ancestor_rows)
+        self.invalidate_ancestors()
+        self.invalidate_descendants()
 
     def select_dir_where_path(self, path: str) -> Optional[tuple[int, str]]:
         """Basic query execution helper that
         selects a 'dir' table row WHERE path = passed path"""
         res = None  # Result
         with self.db.connect() as conn:
-            q = f"SELECT * FROM dir WHERE path = '{path}'"
-            res = conn.execute(q).fetchone()
+            res = conn.execute(SELECT_DIR_WHERE_PATH, (path,)).fetchone()
         return res
 
     def select_dir_where_id(self, id: int) -> Optional[tuple[int, str, str]]:
@@ -130,8 +370,7 @@ class DirRepo:
         """
         res = None  # Result
         with self.db.connect() as conn:
-            q = f"SELECT * FROM dir WHERE id = {id}"
-            res = conn.execute(q).fetchone()
+            res = conn.execute(SELECT_DIR_WHERE_ID, (id,)).fetchone()
         return res
 
     def select_ancestors_where_path(
@@ -152,19 +391,7 @@ class DirRepo:
         if depth is None:
             depth = DEFAULT_DEPTH
         with self.db.connect() as conn:
-            query = """
-                SELECT ancestor_dirs.*
-                FROM (
-                    SELECT d.id AS target_dir_id
-                    FROM dir d
-                    WHERE d.path = ?
-                ) AS target_dir
-                JOIN dir_ancestor da ON target_dir.target_dir_id = da.dir_id
-                JOIN dir ancestor_dirs ON da.ancestor_id = ancestor_dirs.id
-                WHERE da.depth <= ? AND da.depth > 0
-                ORDER BY da.depth
-            """
-            res = conn.execute(query, (path, depth)).fetchall()
+            res = conn.execute(SELECT_ANCESTORS_WHERE_PATH, (path, depth)).fetchall()
         return res
 
     def select_ancestors_where_id(
@@ -183,19 +410,7 @@ class DirRepo:
         if depth is None:
             depth = DEFAULT_DEPTH
         with self.db.connect() as conn:
-            query = """
-                SELECT ancestor_dirs.*
-                FROM (
-                    SELECT d.id AS target_dir_id
-                    FROM dir d
-                    WHERE d.id = ?
-                ) AS target_dir
-                JOIN dir_ancestor da ON target_dir.target_dir_id = da.dir_id
-                JOIN dir ancestor_dirs ON da.ancestor_id = ancestor_dirs.id
-                WHERE da.depth <= ? AND da.depth > 0
-                ORDER BY da.depth
-            """
-            res = conn.execute(query, (id, depth)).fetchall()
+            res = conn.execute(SELECT_ANCESTORS_WHERE_ID, (id, depth)).fetchall()
         return res
 
     def select_descendants_where_path(
@@ -216,19 +431,7 @@ class DirRepo:
         if depth is None:
             depth = DEFAULT_DEPTH
         with self.db.connect() as conn:
-            query = """
-                SELECT descendant_dirs.*
-                FROM (
-                    SELECT d.id AS target_dir_id
-                    FROM dir d
-                    WHERE d.path = ?
-                ) AS target_dir
-                JOIN dir_ancestor da ON target_dir.target_dir_id = da.ancestor_id
-                JOIN dir descendant_dirs ON da.dir_id = descendant_dirs.id
-                WHERE da.depth <= ? AND da.depth > 0
-                ORDER BY da.depth
-            """
-            res = conn.execute(query, (path, depth)).fetchall()
+            res = conn.execute(SELECT_DESCENDANTS_WHERE_PATH, (path, depth)).fetchall()
         return res
 
     # TODO: Fix depth checks not working as expected in test_get_descendandants_dirs #2
@@ -249,19 +452,59 @@ class DirRepo:
             depth = DEFAULT_DEPTH
         res = []
         with self.db.connect() as conn:
-            query = """
-                SELECT descendant_dirs.*
-                FROM (
-                    SELECT d.id AS target_dir_id
-                    FROM dir d
-                    WHERE d.id = ?
-                ) AS target_dir
-                JOIN dir_ancestor da ON target_dir.target_dir_id = da.ancestor_id
-                JOIN dir descendant_dirs ON da.dir_id = descendant_dirs.id
-                WHERE da.depth <= ? AND da.depth > 0
-                ORDER BY da.depth
-            """
-            res = conn.execute(query, (id, depth)).fetchall()
+            res = conn.execute(SELECT_DESCENDANTS_WHERE_ID, (id, depth)).fetchall()
+        return res
+
+    def select_ancestors_where_ids(
+        self, ids: Iterable[int], depth: Optional[int] = DEFAULT_DEPTH
+    ) -> Dict[int, List[Tuple[int, str]]]:
+        """
+        Selects ancestor directories for many directory IDs in a single query.
+
+        Args:
+            ids (Iterable[int]): The directory IDs to find ancestors for.
+            depth (Optional[int]): The maximum depth of the ancestor search. Defaults to the maximum possible depth.
+
+        Returns:
+            Dict[int, List[Tuple[int, str]]]: Each given ID mapped to the rows
+                select_ancestors_where_id would return for it.
+        """
+        if depth is None:
+            depth = DEFAULT_DEPTH
+        ids = list(ids)
+        res = {id: [] for id in ids}
+        if len(ids) == 0:
+            return res
+        with self.db.connect() as conn:
+            params = (json.dumps(ids), depth)
+            for row in conn.execute(SELECT_ANCESTORS_WHERE_IDS, params):
+                res[row[0]].append(row[1:])
+        return res
+
+    def select_descendants_where_ids(
+        self, ids: Iterable[int], depth: Optional[int] = DEFAULT_DEPTH
+    ) -> Dict[int, List[Tuple[int, str]]]:
+        """
+        Selects descendant directories for many directory IDs in a single query.
+
+        Args:
+            ids (Iterable[int]): The directory IDs to find descendants for.
+            depth (Optional[int]): The maximum depth of the descendant search. Defaults to the maximum possible depth.
+
+        Returns:
+            Dict[int, List[Tuple[int, str]]]: Each given ID mapped to the rows
+                select_descendants_where_id would return for it.
+        """
+        if depth is None:
+            depth = DEFAULT_DEPTH
+        ids = list(ids)
+        res = {id: [] for id in ids}
+        if len(ids) == 0:
+            return res
+        with self.db.connect() as conn:
+            params = (json.dumps(ids), depth)
+            for row in conn.execute(SELECT_DESCENDANTS_WHERE_IDS, params):
+                res[row[0]].append(row[1:])
         return res
 
     def add(self, dir: Dir) -> list[Dir]:
@@ -277,27 +520,42 @@ class DirRepo:
         Returns:
             List[Dir]: A list of Dir objects representing the added directories.
         """
-        # Normalize Leaf Dir Path (lp) to repo
-        lp = self.db.normalize_path(dir.path)
-        aps = self.db.ancestor_paths(lp)  # Get ancestor paths (aps)
-        # Add all ancestors to dir table noting that duplicates will be ignored
-        ids = []
-        for ap in aps:
-            id = self.insert_dir(ap)
-            ids.append(id)
-        dir.id = ids[-1]  # Ensure last id on leaf dir id
-
-        #       # Now we need to arrange the dir_ancestor rows (da_rows)
-        da_rows = []
-        for i, ap in enumerate(aps):
-            for j in range(i, -1, -1):  # Reverse order from i to 0 of ids
-                da_rows.append((ids[i], ids[j], i - j))
-        self.insert_dir_ancestor(da_rows)  # Insert rows to dir_ancestor
-
-        # Now create directories with assigned ids and other attrs given
-        daps = [self.db.denormalize_path(ap) for ap in aps]
-        dirs = [Dir(path=ap, id=ids[i]) for i, ap in enumerate(daps)]
-        return dirs
+        # One transaction, one executemany per table, however deep the dir is
+        return self.add_many([dir])[0]
+
+    def add_many(self, dirs: Iterable[Dir]) -> list[list[Dir]]:
+        """
+        Adds many Dir objects' data to the database in a single transaction.
+        Same result as calling add on each dir in order, but every dir row and then
+        every dir_ancestor row goes through one executemany each.
+
+        Args:
+            dirs (Iterable[Dir]): The directory objects to add.
+
+        Returns:
+            List[List[Dir]]: What add would have returned for each given dir.
+        """
+        dirs = list(dirs)
+        apss = [self.db.ancestor_path_strs(dir.path) for dir in dirs]
+        with self.db.connect() as conn:
+            ids = self.insert_dir_paths(conn, (ap for aps in apss for ap in aps))
+            da_rows = []
+            for aps in apss:
+                for i, ap in enumerate(aps):
+                    for j in range(i, -1, -1):  # Reverse order from i to 0 of ids
+                        da_rows.append((ids[ap], ids[aps[j]], i - j))
+            conn.executemany(INSERT_DIR_ANCESTOR, da_rows)
+            conn.commit()
+        self.invalidate_top_level()
+        self.invalidate_ancestors()
+        self.invalidate_descendants()
+
+        fn_dp = self.db.denormalize_path
+        added = []
+        for dir, aps in zip(dirs, apss):
+            dir.id = ids[aps[-1]]  # Ensure last id on leaf dir id
+            added.append([Dir(path=fn_dp(ap), id=ids[ap]) for ap in aps])
+        return added
 
     def getone(
         self,
@@ -307,6 +565,7 @@ class DirRepo:
     ) -> Optional[Dir]:
         """
         Retrieves a single directory based on id, path, or Dir object.
+        Top-level dirs are served from top_level_dirs without a query.
 
         Args:
             id (Optional[int]): The directory ID.
@@ -316,23 +575,20 @@ class DirRepo:
         Returns:
             Optional[Dir]: The matching Dir object or None if not found.
         """
-        id_used = None
-        path_used = None
-        if id is not None:
-            id_used = id
-        elif path is not None:
-            path_used = path
-        elif dir is not None:
-            id_used = dir.id
-            path_used = dir.path
-        else:
-            raise ValueError("Must provide either id, path, or dir argument.")
+        id_used, path_used = self.resolve_lookup(id, path, dir)
         res = None
+        top_level = self.top_level_dirs()
         if id_used:
-            res = self.select_dir_where_id(id_used)
+            if id_used in top_level:
+                res = (id_used, top_level[id_used])
+            else:
+                res = self.select_dir_where_id(id_used)
         elif path_used:
             path_used = str(self.db.normalize_path(path_used))
-            res = self.select_dir_where_path(path_used)
+            if path_used in self._l1_ids_by_path:
+                res = (self._l1_ids_by_path[path_used], path_used)
+            else:
+                res = self.select_dir_where_path(path_used)
         if res is None:
             return None
         return Dir(id=res[0], path=self.db.denormalize_path(res[1]))
@@ -346,6 +602,8 @@ class DirRepo:
     ) -> list[Dir]:
         """
         Retrieves ancestor directories up to a specified depth.
+        Inside a cached() block results are memoized per (id, depth) or (path, depth)
+        until the next insert, top-level dirs are answered from top_level_dirs.
 
         Args:
             id (Optional[int]): The directory ID.
@@ -356,30 +614,71 @@ class DirRepo:
         Returns:
             List[Dir]: A list of Dir objects representing the ancestor directories.
         """
-        id_used = None
-        path_used = None
-        if id is not None:
-            id_used = id
-        elif path is not None:
-            path_used = path
-        elif dir is not None:
-            id_used = dir.id
-            path_used = dir.path
-        else:
-            raise ValueError("Must provide either id, path, or dir argument.")
-        rows = []
+        id_used, path_used = self.resolve_lookup(id, path, dir)
+        if depth is None:
+            depth = DEFAULT_DEPTH
+        fn_dp = self.db.denormalize_path
+        top_level = self.top_level_dirs()
+        # Outside a cached() block results go in a throwaway memo instead
+        anc_cache = self._anc_cache if self._caching else {}
+        anc_path_cache = self._anc_path_cache if self._caching else {}
+        if not id_used and path_used:
+            if not self.db.is_normalized(path_used):
+                path_used = str(self.db.normalize_path(path_used))
         if id_used:
-            rows = self.select_ancestors_where_id(id_used, depth)
+            key = (id_used, depth)
+            if id_used in top_level:
+                return []
+            if key not in anc_cache:
+                rows = self.select_ancestors_where_id(id_used, depth)
+                anc_cache[key] = [(r[0], fn_dp(r[1])) for r in rows]
+            pairs = anc_cache[key]
         elif path_used:
-            path_used = str(self.db.normalize_path(path_used))
-            rows = self.select_ancestors_where_path(path_used, depth)
+            key = (path_used, depth)
+            if path_used in self._l1_ids_by_path:
+                return []
+            if key not in anc_path_cache:
+                rows = self.select_ancestors_where_path(path_used, depth)
+                anc_path_cache[key] = [(r[0], fn_dp(r[1])) for r in rows]
+            pairs = anc_path_cache[key]
         else:
             raise ValueError("Must provide either id or path argument.")
 
-        fn_dp = self.db.denormalize_path
-        dirs = [Dir(id=r[0], path=fn_dp(r[1])) for r in rows]
+        # Fresh Dir objects every call so callers can't mutate the memo
+        dirs = [Dir(id=id, path=path) for id, path in pairs]
         return dirs
 
+    def get_ancestors_many(
+        self, ids: Iterable[int], depth: int = DEFAULT_DEPTH
+    ) -> Dict[int, List[Dir]]:
+        """
+        Retrieves ancestor directories of many directory IDs at once.
+        IDs missing from the get_ancestors memo are fetched in one query,
+        & memoized when inside a cached() block.
+
+        Args:
+            ids (Iterable[int]): The directory IDs.
+            depth (int): The maximum depth of the ancestor search. Defaults to the maximum possible depth.
+
+        Returns:
+            Dict[int, List[Dir]]: Each given ID mapped to what get_ancestors returns for it.
+        """
+        if depth is None:
+            depth = DEFAULT_DEPTH
+        ids = list(ids)
+        fn_dp = self.db.denormalize_path
+        anc_cache = self._anc_cache if self._caching else {}
+        missing = [id for id in ids if (id, depth) not in anc_cache]
+        for id, rows in self.select_ancestors_where_ids(missing, depth).items():
+            anc_cache[(id, depth)] = [(r[0], fn_dp(r[1])) for r in rows]
+
+        # Fresh Dir objects every call so callers can't mutate the memo
+        res = {}
+        for id in ids:
+            pairs = anc_cache[(id, depth)]
+            res[id] = [Dir(id=aid, path=path) for aid, path in pairs]
+        return res
+
     def get_descendants(
         self,
         id: Optional[int] = None,
@@ -389,6 +688,8 @@ class DirRepo:
     ) -> list[Dir]:
         """
         Retrieves descendant directories up to a specified depth.
+        Inside a cached() block results are memoized per (id, depth) or (path, depth)
+        until the next insert.
 
         Args:
             id (Optional[int]): The directory ID.
@@ -399,28 +700,56 @@ class DirRepo:
         Returns:
             List[Dir]: A list of Dir objects representing the descendant directories.
         """
-        id_used = None
-        path_used = None
-        if id is not None:
-            id_used = id
-        elif path is not None:
-            path_used = path
-        elif dir is not None:
-            id_used = dir.id
-            path_used = dir.path
-        else:
-            raise ValueError("Must provide either id, path, or dir argument.")
-        rows = []
+        return list(self.iter_descendants(id=id, path=path, dir=dir, depth=depth))
+
+    def iter_descendants(
+        self,
+        id: Optional[int] = None,
+        path: Optional[Union[PP, str]] = None,
+        dir: Optional[Dir] = None,
+        depth: int = DEFAULT_DEPTH,
+    ) -> Iterator[Dir]:
+        """
+        Lazily yields the same descendants get_descendants returns, in the same order.
+        Arguments are resolved & the rows fetched in one query on call, only building
+        each Dir is deferred until iterated to, so callers that stop early skip
+        building the Dirs of the rest of the subtree.
+        NOTE: Rows aren't streamed from the cursor, that would hold the connection
+        & its read lock open for as long as the caller takes to iterate.
+
+        Args:
+            id (Optional[int]): The directory ID.
+            path (Optional[Union[PP, str]]): The directory path.
+            dir (Optional[Dir]): The directory object.
+            depth (int): The maximum depth of the descendant search. Defaults to the maximum possible depth.
+
+        Returns:
+            Iterator[Dir]: Dir objects for the descendant directories.
+        """
+        id_used, path_used = self.resolve_lookup(id, path, dir)
+        if depth is None:
+            depth = DEFAULT_DEPTH
+        # Outside a cached() block results go in a throwaway memo instead
+        desc_cache = self._desc_cache if self._caching else {}
+        desc_path_cache = self._desc_path_cache if self._caching else {}
         if id_used:
-            rows = self.select_descendants_where_id(id_used, depth)
+            key = (id_used, depth)
+            if key not in desc_cache:
+                rows = self.select_descendants_where_id(id_used, depth)
+                desc_cache[key] = rows
+            rows = desc_cache[key]
         elif path_used:
-            path_used = str(self.db.normalize_path(path_used))
-            rows = self.select_descendants_where_path(path_used, depth)
+            if not self.db.is_normalized(path_used):
+                path_used = str(self.db.normalize_path(path_used))
+            key = (path_used, depth)
+            if key not in desc_path_cache:
+                rows = self.select_descendants_where_path(path_used, depth)
+                desc_path_cache[key] = rows
+            rows = desc_path_cache[key]
         else:
             raise ValueError(
                 "Must provide either id or path argument individually or in a dir object."
             )
 
         fn_dp = self.db.denormalize_path
-        dirs = [Dir(id=r[0], path=fn_dp(r[1])) for r in rows]
-        return dirs
+        return (Dir(id=r[0], path=fn_dp(r[1])) for r in rows)
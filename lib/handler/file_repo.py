@@ -85,21 +85,22 @@ class FileRepo:
             result = c.execute(query).fetchone()
             return result
 
+    @staticmethod
     def select_files_where_query(
-        self,
         id: Optional[int] = None,
         dir_id: Optional[int] = None,
         name: Optional[str] = None,
         md5: Optional[str] = None,
         mtime: Optional[int] = None,
         updated: Optional[int] = None,
-    ) -> str:
+    ) -> Tuple[str, Tuple[Any, ...]]:
         """
-        Generate an SQL query string to select file records based on provided conditions.
+        Generate a parameterized SQL query to select file records based on provided conditions.
 
         This method constructs an SQL `SELECT` statement to fetch records from the 'file' table
-        where the specified conditions are met. If `id` is provided, it returns the query
-        immediately since `id` is unique.
+        where the specified conditions are met, with a `?` placeholder per condition so
+        sqlite can bind the values and reuse its cached statement.
+        If `id` is provided, it returns the query immediately since `id` is unique.
 
         Args:
             id (Optional[int]): The ID of the file.
@@ -110,16 +111,16 @@ class FileRepo:
             updated (Optional[int]): The last updated time of the file.
 
         Returns:
-            str: An SQL query string to select file records based on the provided conditions.
+            Tuple[str, Tuple[Any, ...]]: The SQL query string & the values to bind to it.
 
         Raises:
             TypeError: If none of the arguments are provided.
 
         Example:
-            query = select_files_where_query(name='example_file.txt', md5='d41d8cd98f00b204e9800998ecf8427e')
-            print(query)
+            query, params = select_files_where_query(name='example_file.txt', md5='d41d8cd98f00b204e9800998ecf8427e')
+            print(query, params)
             # Outputs:
-            # SELECT * FROM file WHERE name = 'example_file.txt' AND md5 = 'd41d8cd98f00b204e9800998ecf8427e';
+            # SELECT * FROM file WHERE name = ? AND md5 = ?; ('example_file.txt', 'd41d8cd98f00b204e9800998ecf8427e')
         """
         args = {
             "id": id,
@@ -140,19 +141,15 @@ class FileRepo:
         q = "SELECT * FROM file WHERE "
         # Return early if id is provided since id is unique.
         if id is not None:
-            q += f"id = {id};"
-            return q
+            return q + "id = ?;", (id,)
         # Add each non-None arg as WHERE clauses with 'AND' between each.
+        conditions, params = [], []
         for arg in args:
             if args[arg] is None:
                 continue  # If arg is None, continue to next arg.
-            elif isinstance(args[arg], str):  # Str needs quotes
-                q += f"{arg} = '{args[arg]}' AND "
-            else:
-                q += f"{arg} = {args[arg]} AND "
-        # Remove trailing ' AND ' and add semicolon to close query string.
-        q = q[:-5] + ";"
-        return q
+            conditions.append(f"{arg} = ?")
+            params.append(args[arg])
+        return q + " AND ".join(conditions) + ";", tuple(params)
 
     ### Repo Action Methods ###
     # TODO: Test that all but dir_id & id stays the same on return
@@ -161,12 +158,13 @@ class FileRepo:
         if not isinstance(files, list):
             files = [files]
         inserted_files = []
-        for file in files:
-            dir_id = file.dir_id
-            path = self.db.normalize_path(file.path)
-            parent = path.parent
-            with self.db.connect() as conn:
-                c = conn.cursor()
+        # One connection & transaction for the whole batch of files
+        with self.db.connect() as conn:
+            c = conn.cursor()
+            for file in files:
+                dir_id = file.dir_id
+                path = self.db.normalize_path(file.path)
+                parent = path.parent
                 if dir_id is None:
                     if parent == PP("."):  # Handle files in repo root
                         dir_id = 0
@@ -183,7 +181,6 @@ class FileRepo:
                         q_sel = "SELECT path from dir WHERE id = ?;"
                         parent = c.execute(q_sel, (dir_id,)).fetchone()
                         if parent is None or len(parent) == 0:
-                            breakpoint()
                             msg = f"Trying to insert file with no directory @{dir_id}"
                             raise ValueError(msg)
                         parent = self.db.normalize_path(parent[0])
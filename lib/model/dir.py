@@ -28,6 +28,9 @@ class Dir:
     # TODO: Refactor to use path objects along with str to path
     """Represents a single directory"""
 
+    # Walks create a Dir per row, slots keep them free of a per instance __dict__
+    __slots__ = ("path", "id")
+
     path: PurePath
     id: Optional[int]
 
@@ -57,10 +60,8 @@ class Dir:
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Dir):
             return False
-        for attr in ["name", "path", "id"]:
-            if getattr(self, attr) != getattr(other, attr):
-                return False
-        return True
+        # name derives from path, ids are the cheap mismatch so go first
+        return self.id == other.id and self.path == other.path
 
     def __repr__(self) -> str:
         return f"Dir(path={self.path}, id={self.id})"
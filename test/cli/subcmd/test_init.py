@@ -1,9 +1,8 @@
-from contextlib import contextmanager
+from contextlib import closing
 import os
 import pytest
 import subprocess
 import sqlite3 as sql
-import tempfile
 from unittest.mock import patch, Mock
 
 from cli import main
@@ -30,22 +29,18 @@ def run_main_init(argv):
 
 
 @pytest.fixture
-@contextmanager
-def temp_dir_context():
-    with tempfile.TemporaryDirectory() as temp_dir:
-        yield str(temp_dir)
+def temp_dir(tmp_path):
+    return str(tmp_path)
 
 
 @pytest.fixture
-@contextmanager
-def non_scout_db(temp_dir_context):
-    with temp_dir_context as dp:
-        db_path = f"{dp}/nonscout.db"
-        with sql.connect(db_path) as conn:
-            conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
-            conn.execute("INSERT INTO test (txt) VALUES ('test');")
-            conn.commit()
-        yield dp, str(db_path)
+def non_scout_db(temp_dir):
+    db_path = f"{temp_dir}/nonscout.db"
+    with closing(sql.connect(db_path)) as conn:
+        conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
+        conn.execute("INSERT INTO test (txt) VALUES ('test');")
+        conn.commit()
+    return temp_dir, str(db_path)
 
 
 class TestOpts:
@@ -163,13 +158,13 @@ class TestHandleErrors:
         assert repo in captured.err  # Check wrongful target in message
         assert DBNotInDirError.__name__ in captured.err  # Check correct error
 
-    def testFileOccupied(self, capsys, temp_dir_context):
+    def testFileOccupied(self, capsys, temp_dir):
         """Test DBFileOccupiedError when repo path is a file."""
-        with temp_dir_context as dp:
-            occupied_path = f"{dp}/occupied.txt"
-            with open(occupied_path, "w") as f:
-                f.write("DELETEME\ntest file from test/cli/subcmd/test_init.py")
-            rc = run_main_init(["-r", occupied_path])
+        dp = temp_dir
+        occupied_path = f"{dp}/occupied.txt"
+        with open(occupied_path, "w") as f:
+            f.write("DELETEME\ntest file from test/cli/subcmd/test_init.py")
+        rc = run_main_init(["-r", occupied_path])
         assert rc == 17
         captured = capsys.readouterr()
         assert "Error:" in captured.err
@@ -177,15 +172,15 @@ class TestHandleErrors:
         assert occupied_path in captured.err
         assert DBFileOccupiedError.__name__ in captured.err
 
-    def testDBRootNotDir(self, capsys, temp_dir_context):
+    def testDBRootNotDir(self, capsys, temp_dir):
         """Test DBRootNotDirError when target is a file.
         Need to make sure the repo path is empty and in valid directory and
         put target path in a file not dir."""
-        with temp_dir_context as dp:
-            target_path = f"{dp}/target-not-a-dir.txt"
-            with open(target_path, "w") as f:
-                f.write("DELETEME\ntest file from test/cli/subcmd/test_init.py")
-            rc = run_main_init([target_path, "-r", f"{dp}/test.db"])
+        dp = temp_dir
+        target_path = f"{dp}/target-not-a-dir.txt"
+        with open(target_path, "w") as f:
+            f.write("DELETEME\ntest file from test/cli/subcmd/test_init.py")
+        rc = run_main_init([target_path, "-r", f"{dp}/test.db"])
         assert rc == 18
         captured = capsys.readouterr()
         assert "Error:" in captured.err
@@ -193,18 +188,18 @@ class TestHandleErrors:
         assert target_path in captured.err
         assert DBRootNotDirError.__name__ in captured.err
 
-    def testScoutAlreadyInit(self, capsys, temp_dir_context):
+    def testScoutAlreadyInit(self, capsys, temp_dir):
         """Tests that if a scout db file already exists in the target directory,
         that the function raises and handles properly a DBScoutAlreadyInitError."""
-        with temp_dir_context as dp:
-            scout_db = f"{dp}/.scout.db"
-            with sql.connect(scout_db) as conn:
-                q = "CREATE TABLE fs_meta (property TEXT PRIMARY KEY, value TEXT);"
-                conn.execute(q)
-                ins_query = "INSERT INTO fs_meta (property, value) VALUES (?, ?);"
-                conn.execute(ins_query, ("root", "test"))
-                conn.commit()
-            rc = run_main_init([dp])
+        dp = temp_dir
+        scout_db = f"{dp}/.scout.db"
+        with closing(sql.connect(scout_db)) as conn:
+            q = "CREATE TABLE fs_meta (property TEXT PRIMARY KEY, value TEXT);"
+            conn.execute(q)
+            ins_query = "INSERT INTO fs_meta (property, value) VALUES (?, ?);"
+            conn.execute(ins_query, ("root", "test"))
+            conn.commit()
+        rc = run_main_init([dp])
         assert rc == 20
         captured = capsys.readouterr()
         assert "Error:" in captured.err
@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+import os
+import pytest
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+from lib.handler.db_connector import DBConnector, MEMORY_PATH
+
+FD_DIR = "/proc/self/fd"
+# Set SCOUT_TEST_TMPFS (e.g. SCOUT_TEST_TMPFS=1 on Linux CI) to put every
+# test tempdir on tmpfs, so on-disk test dbs never touch a real disk
+TMPFS_ENV = "SCOUT_TEST_TMPFS"
+TMPFS_DIR = "/dev/shm"
+
+# Pragmas that skip fsync & keep journals in memory for throwaway test DBs
+TEST_PRAGMAS = """
+    PRAGMA journal_mode=MEMORY;
+    PRAGMA synchronous=OFF;
+    PRAGMA temp_store=MEMORY;
+"""
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fast_sqlite_pragmas():
+    """Wraps DBConnector.connect for the whole test session so every
+    new file connection it opens runs TEST_PRAGMAS before being handed out.
+    init_fs_meta gets wrapped too, since creating a db file commits
+    its fs_meta table on a connection of its own, & every in-memory db
+    gets its one connection's pragmas there when it's created.
+    NOTE: executescript commits first, so the pragmas only ever run on
+    connections that can't have a transaction open yet."""
+    connect = DBConnector.connect
+    init_fs_meta = DBConnector.init_fs_meta
+
+    @contextmanager
+    def fast_connect(self):
+        with connect(self) as conn:
+            if conn is not self.mem_conn:
+                conn.executescript(TEST_PRAGMAS)
+            yield conn
+
+    def fast_init_fs_meta(conn, root):
+        conn.executescript(TEST_PRAGMAS)
+        init_fs_meta(conn, root)
+
+    with (
+        patch.object(DBConnector, "connect", fast_connect),
+        patch.object(DBConnector, "init_fs_meta", staticmethod(fast_init_fs_meta)),
+    ):
+        yield
+
+
+def pytest_configure(config):
+    """Points tempfile at TMPFS_DIR for the whole test session when
+    TMPFS_ENV is set & the platform has one, so tmp_path & tempfile dbs
+    live in RAM without changing how sqlite uses them.
+    Runs before xdist starts its workers, whose basetemps get made under
+    the controller's, & TMPDIR is exported for anything they spawn."""
+    if not os.environ.get(TMPFS_ENV) or not os.path.isdir(TMPFS_DIR):
+        return
+    os.environ["TMPDIR"] = TMPFS_DIR
+    tempfile.tempdir = TMPFS_DIR
+
+
+@pytest.fixture(scope="session")
+def clone_db():
+    """
+    Returns a helper that copies a template db into a fresh in-memory db with
+    sqlite's backup API, skipping the DDL & inserts the template was built with.
+    Session scoped so fixtures of any scope can clone with it.
+    NOTE: The returned connector holds the db in memory until closed.
+    """
+
+    def clone(template: DBConnector) -> DBConnector:
+        conn = sqlite3.connect(MEMORY_PATH)
+        conn.executescript(TEST_PRAGMAS)
+        template.mem_conn.backup(conn)
+        return DBConnector.from_connection(conn, template.root)
+
+    return clone
+
+
+@pytest.fixture(autouse=True)
+def fd_leak_guard():
+    """Fails a test that leaves any extra file descriptor open,
+    e.g. from a sqlite connection that never got closed.
+    Only active where the platform exposes FD_DIR."""
+    if not os.path.isdir(FD_DIR):
+        yield
+        return
+    before = len(os.listdir(FD_DIR))
+    yield
+    assert len(os.listdir(FD_DIR)) <= before
@@ -1,9 +1,8 @@
-from contextlib import contextmanager
+from contextlib import closing
 import os
 from pathlib import PurePath as PP
 import pytest
 import sqlite3 as sql
-import tempfile
 from unittest.mock import patch, MagicMock
 
 from lib.handler.db_connector import (
@@ -16,27 +15,22 @@ from lib.handler.db_connector import (
     DBTargetPropMissingError,
     DBPathOutsideTargetError,
     DBPathNotSupportedError,
+    join_root,
+    normalize_to_root,
+    MEMORY_PATH,
 )
 from lib.model.dir import Dir
 
 MOD_BASE = "lib.handler.db_connector.DBConnector"
 
 
-@contextmanager
-def temp_dir_context():
-    with tempfile.TemporaryDirectory() as temp_dir:
-        yield PP(temp_dir)
-
-
 @pytest.fixture
-@contextmanager
-def bare_db():
-    with temp_dir_context() as dp:
-        path_root = dp / "root"
-        path_db = dp / "test.db"
-        os.mkdir(path_root)
-        db = DBConnector(path_db, path_root)
-        yield db
+def bare_db(tmp_path):
+    dp = PP(tmp_path)
+    path_root = dp / "root"
+    path_db = dp / "test.db"
+    os.mkdir(path_root)
+    return DBConnector(path_db, path_root)
 
 
 @pytest.fixture
@@ -50,8 +44,7 @@ def mock_db_conn():
 
 # TODO: Give comment including filetree contents
 @pytest.fixture
-@contextmanager
-def fake_files_dir():
+def fake_files_dir(tmp_path):
     """Creates below filetree fixture
     temp_dir/
     ├── dir/ # Empty directory for root property to point to
@@ -60,68 +53,62 @@ def fake_files_dir():
     ├── base.scout.db # A bare scout db file with root pointing to temp_dir/dir
     └── noroot.db # A scout db file with no root property
     """
-    with temp_dir_context() as temp_dir:
-        os.mkdir(temp_dir / "dir")
-        with open(temp_dir / "test.txt", "w") as f:
-            f.write("Hello World!")
-        with sql.connect(temp_dir / "test.db") as conn:
-            conn.execute("CREATE TABLE foobar (id TEXT PRIMARY KEY, txt TEXT);")
-            conn.execute("INSERT INTO foobar (id, txt) VALUES ('foo', 'bar');")
-            conn.commit()
-        with sql.connect(temp_dir / "base.scout.db") as conn:
-            q = "CREATE TABLE fs_meta (property TEXT PRIMARY KEY, value TEXT);"
-            conn.execute(q)
-            q = f"INSERT INTO fs_meta (property, value) VALUES ('root', '{temp_dir}/dir');"
-            conn.execute(q)
-            conn.commit()
-        with sql.connect(temp_dir / "noroot.db") as conn:
-            q = "CREATE TABLE fs_meta (property TEXT PRIMARY KEY, value TEXT);"
-            conn.execute(q)
-            q = "INSERT INTO fs_meta (property, value) VALUES ('noroot', '/a/b');"
-            conn.execute(q)
-            conn.commit()
-        yield temp_dir
+    temp_dir = PP(tmp_path)
+    os.mkdir(temp_dir / "dir")
+    with open(temp_dir / "test.txt", "w") as f:
+        f.write("Hello World!")
+    with closing(sql.connect(temp_dir / "test.db")) as conn:
+        conn.execute("CREATE TABLE foobar (id TEXT PRIMARY KEY, txt TEXT);")
+        conn.execute("INSERT INTO foobar (id, txt) VALUES ('foo', 'bar');")
+        conn.commit()
+    with closing(sql.connect(temp_dir / "base.scout.db")) as conn:
+        q = "CREATE TABLE fs_meta (property TEXT PRIMARY KEY, value TEXT);"
+        conn.execute(q)
+        q = f"INSERT INTO fs_meta (property, value) VALUES ('root', '{temp_dir}/dir');"
+        conn.execute(q)
+        conn.commit()
+    with closing(sql.connect(temp_dir / "noroot.db")) as conn:
+        q = "CREATE TABLE fs_meta (property TEXT PRIMARY KEY, value TEXT);"
+        conn.execute(q)
+        q = "INSERT INTO fs_meta (property, value) VALUES ('noroot', '/a/b');"
+        conn.execute(q)
+        conn.commit()
+    return temp_dir
 
 
 class TestFixtures:
     """Tests fixtures used in DBConnector tests."""
 
     def testFakeFilesDirFs(self, fake_files_dir):
-        with fake_files_dir as dp:
-            assert os.path.isdir(dp / "dir")
-            assert os.path.exists(dp / "test.txt")
-            assert os.path.exists(dp / "test.db")
-            assert os.path.exists(dp / "base.scout.db")
-            with open(dp / "test.txt") as f:
-                assert f.read() == "Hello World!"
-            with sql.connect(dp / "test.db") as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM foobar;")
-                assert cursor.fetchone() == ("foo", "bar")
-            with sql.connect(dp / "base.scout.db") as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM fs_meta;")
-                assert cursor.fetchone() == ("root", str(dp / "dir"))
-            with sql.connect(dp / "noroot.db") as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM fs_meta;")
-                assert cursor.fetchone() == ("noroot", "/a/b")
-
-    def testFakeFilesDirClean(self, fake_files_dir):
-        """fake_files_dir dir and contents should be cleaned after context."""
-        with fake_files_dir as dp:
-            assert os.path.exists(dp)
-        assert not os.path.exists(dp)
+        dp = fake_files_dir
+        assert os.path.isdir(dp / "dir")
+        assert os.path.exists(dp / "test.txt")
+        assert os.path.exists(dp / "test.db")
+        assert os.path.exists(dp / "base.scout.db")
+        with open(dp / "test.txt") as f:
+            assert f.read() == "Hello World!"
+        with closing(sql.connect(dp / "test.db")) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM foobar;")
+            assert cursor.fetchone() == ("foo", "bar")
+        with closing(sql.connect(dp / "base.scout.db")) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM fs_meta;")
+            assert cursor.fetchone() == ("root", str(dp / "dir"))
+        with closing(sql.connect(dp / "noroot.db")) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM fs_meta;")
+            assert cursor.fetchone() == ("noroot", "/a/b")
 
     def testBareDb(self, bare_db):
-        with bare_db as db:
-            root = PP()
-            with sql.connect(db.path) as conn:
-                c = conn.cursor()
-                c.execute("SELECT value FROM fs_meta WHERE property='root';")
-                root = PP(c.fetchone()[0])
-            assert db.root == root
-            assert db.path == db.root.parent / "test.db"
+        db = bare_db
+        root = PP()
+        with closing(sql.connect(db.path)) as conn:
+            c = conn.cursor()
+            c.execute("SELECT value FROM fs_meta WHERE property='root';")
+            root = PP(c.fetchone()[0])
+        assert db.root == root
+        assert db.path == db.root.parent / "test.db"
 
 
 class TestErrors:
@@ -211,11 +198,11 @@ class TestInitValid:
 
     def testIsDBFile(self, fake_files_dir):
         """Returns true for sqlite3 file, false otherwise"""
-        with fake_files_dir as dp:
-            assert DBConnector.is_db_file(dp / "test.db")
-            assert DBConnector.is_db_file(dp / "base.scout.db")
-            assert DBConnector.is_db_file(dp / "noroot.db")
-            assert not DBConnector.is_db_file(dp / "test.txt")
+        dp = fake_files_dir
+        assert DBConnector.is_db_file(dp / "test.db")
+        assert DBConnector.is_db_file(dp / "base.scout.db")
+        assert DBConnector.is_db_file(dp / "noroot.db")
+        assert not DBConnector.is_db_file(dp / "test.txt")
 
     def testIsScoutDBFile(self, fake_files_dir):
         """Correctly returns bool for:
@@ -224,11 +211,11 @@ class TestInitValid:
             - Not a db file (e.g. a txt file saying Hello World!)
             - A db file but doesn't have fs_meta table
         """
-        with fake_files_dir as dp:  # dp = dir path to fake temp directory
-            assert DBConnector.is_scout_db_file(dp / "base.scout.db")
-            assert not DBConnector.is_scout_db_file(dp / "test.db")
-            assert not DBConnector.is_scout_db_file(dp / "test.txt")
-            assert not DBConnector.is_scout_db_file(dp / "noroot.db")
+        dp = fake_files_dir  # dp = dir path to fake temp directory
+        assert DBConnector.is_scout_db_file(dp / "base.scout.db")
+        assert not DBConnector.is_scout_db_file(dp / "test.db")
+        assert not DBConnector.is_scout_db_file(dp / "test.txt")
+        assert not DBConnector.is_scout_db_file(dp / "noroot.db")
 
     @pytest.mark.parametrize(
         "path, expect",
@@ -245,8 +232,8 @@ class TestInitValid:
         2. Return a PP object when a scout db file path given as PP
         """
         fn = DBConnector.validate_arg_path
-        with fake_files_dir as dp:
-            assert fn(f"{dp}/{path}") == PP(dp / expect)
+        dp = fake_files_dir
+        assert fn(f"{dp}/{path}") == PP(dp / expect)
 
     @pytest.mark.parametrize(
         "path, raises",
@@ -273,9 +260,9 @@ class TestInitValid:
         6. Raise a DBFileOccupiedError when path exists and is db file,
            but doesnt contain the fs_meta.root marker
         """
-        with fake_files_dir as dp:
-            with pytest.raises(raises):
-                DBConnector.validate_arg_path(dp / path)
+        dp = fake_files_dir
+        with pytest.raises(raises):
+            DBConnector.validate_arg_path(dp / path)
 
     def testValidArgRootReturn(self, fake_files_dir):
         """
@@ -286,10 +273,10 @@ class TestInitValid:
         """
         fn = DBConnector.validate_arg_root
         basename = "base.scout.db"
-        with fake_files_dir as dp:
-            assert fn(dp / basename, None) == dp  # Default to path.parent
-            assert fn(dp / basename, dp / "dir") == dp / "dir"
-            assert fn(dp / basename, str(dp / "dir")) == dp / "dir"
+        dp = fake_files_dir
+        assert fn(dp / basename, None) == dp  # Default to path.parent
+        assert fn(dp / basename, dp / "dir") == dp / "dir"
+        assert fn(dp / basename, str(dp / "dir")) == dp / "dir"
 
     def testValidArgRootRaises(self, fake_files_dir):
         """
@@ -301,15 +288,15 @@ class TestInitValid:
         """
         fn = DBConnector.validate_arg_root
         basename = "base.scout.db"
-        with fake_files_dir as dp:
-            with pytest.raises(TypeError):
-                fn(dp / basename, 1)  # type: ignore
-            with pytest.raises(DBRootNotDirError):
-                fn(dp / basename, "/not/there")
-            with pytest.raises(DBRootNotDirError):
-                fn(dp / basename, dp / "test.txt")
-            with pytest.raises(DBRootNotDirError):
-                fn(dp / basename, dp / basename)
+        dp = fake_files_dir
+        with pytest.raises(TypeError):
+            fn(dp / basename, 1)  # type: ignore
+        with pytest.raises(DBRootNotDirError):
+            fn(dp / basename, "/not/there")
+        with pytest.raises(DBRootNotDirError):
+            fn(dp / basename, dp / "test.txt")
+        with pytest.raises(DBRootNotDirError):
+            fn(dp / basename, dp / basename)
 
 
 class TestInitSql:
@@ -322,25 +309,25 @@ class TestInitSql:
         - First column is property TEXT PRIMARY KEY
         - Second column is value TEXT
         - Only row has values ('root', '/a/b')"""
-        with fake_files_dir as dp:
-            path = dp / "init.db"
-            DBConnector.init_db(path, PP("/a/b"))
-            assert DBConnector.is_db_file(path)
-            assert DBConnector.is_scout_db_file(path)
-            with sql.connect(path) as conn:
-                c = conn.cursor()
-                # Query & assert fs_meta table exists
-                c.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                tables = c.fetchall()
-                assert ("fs_meta",) in tables
-                # Query & assert fs_meta table has correct columns
-                c.execute("PRAGMA table_info(fs_meta);")
-                columns = c.fetchall()
-                assert columns[0][1] == "property"
-                assert columns[1][1] == "value"
-                assert columns[0][2] == columns[1][2] == "TEXT"
-                c.execute("SELECT value FROM fs_meta WHERE property='root';")
-                assert c.fetchone()[0] == "/a/b"
+        dp = fake_files_dir
+        path = dp / "init.db"
+        DBConnector.init_db(path, PP("/a/b"))
+        assert DBConnector.is_db_file(path)
+        assert DBConnector.is_scout_db_file(path)
+        with closing(sql.connect(path)) as conn:
+            c = conn.cursor()
+            # Query & assert fs_meta table exists
+            c.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            tables = c.fetchall()
+            assert ("fs_meta",) in tables
+            # Query & assert fs_meta table has correct columns
+            c.execute("PRAGMA table_info(fs_meta);")
+            columns = c.fetchall()
+            assert columns[0][1] == "property"
+            assert columns[1][1] == "value"
+            assert columns[0][2] == columns[1][2] == "TEXT"
+            c.execute("SELECT value FROM fs_meta WHERE property='root';")
+            assert c.fetchone()[0] == "/a/b"
 
     def testInitDbRaisesOnChange(self, fake_files_dir):
         """
@@ -349,27 +336,27 @@ class TestInitSql:
             - Not change the db file's contents
             - Not change the root property's value in the fs_meta table
         """
-        with fake_files_dir as dp:
-            # First read the old contents of the scout db file @ base.scout.db
-            old_contents = b""
-            new_contents = b""
-            with open(dp / "base.scout.db", "rb") as f:
-                old_contents = f.read()
-            # Now that we know the old file contents,
-            # check that sqlite's integryity error is raised when
-            # trying to init the db file again.
-            with pytest.raises(sql.IntegrityError):
-                DBConnector.init_db(dp / "base.scout.db", PP("/f/g"))
-            # With the init_db call, check binary contents of the file afterwards
-            with open(dp / "base.scout.db", "rb") as f:
-                new_contents = f.read()
-            # Assert the binary contents did not change
-            assert old_contents == new_contents
-            # Now finally check for the root property's value column for old value
-            with sql.connect(dp / "base.scout.db") as conn:
-                c = conn.cursor()
-                c.execute("SELECT value FROM fs_meta WHERE property='root';")
-                assert c.fetchone()[0] == str(dp / "dir")
+        dp = fake_files_dir
+        # First read the old contents of the scout db file @ base.scout.db
+        old_contents = b""
+        new_contents = b""
+        with open(dp / "base.scout.db", "rb") as f:
+            old_contents = f.read()
+        # Now that we know the old file contents,
+        # check that sqlite's integryity error is raised when
+        # trying to init the db file again.
+        with pytest.raises(sql.IntegrityError):
+            DBConnector.init_db(dp / "base.scout.db", PP("/f/g"))
+        # With the init_db call, check binary contents of the file afterwards
+        with open(dp / "base.scout.db", "rb") as f:
+            new_contents = f.read()
+        # Assert the binary contents did not change
+        assert old_contents == new_contents
+        # Now finally check for the root property's value column for old value
+        with closing(sql.connect(dp / "base.scout.db")) as conn:
+            c = conn.cursor()
+            c.execute("SELECT value FROM fs_meta WHERE property='root';")
+            assert c.fetchone()[0] == str(dp / "dir")
 
     @pytest.mark.parametrize(
         "path, root",
@@ -380,29 +367,29 @@ class TestInitSql:
         - Correct root property value from fs_meta table
         - Returns only PP values
         """
-        with fake_files_dir as dp:
-            path = dp / path
-            DBConnector.init_db(path, root)
-            assert DBConnector.read_root(path) == PP(root)
-            assert isinstance(DBConnector.read_root(path), PP)
+        dp = fake_files_dir
+        path = dp / path
+        DBConnector.init_db(path, root)
+        assert DBConnector.read_root(path) == PP(root)
+        assert isinstance(DBConnector.read_root(path), PP)
 
     def testReadRootRaisesNoRoot(self, fake_files_dir):
         """DBConnector.read_root raises DBNoFsMetaTableError when
         fs_meta table doesn't exist and
         DBConnector.read_root raises DBTargetPropMissingError when
         root property is not found."""
-        with fake_files_dir as dp:
-            # Check raises when no fs_meta table
-            with pytest.raises(DBNoFsMetaTableError):
-                DBConnector.read_root(dp / "test.db")
-            # Check raises when no 'root' in property column
-            with sql.connect(dp / "test.db") as conn:
-                c = conn.cursor()
-                q = "CREATE TABLE fs_meta (property TEXT PRIMARY KEY, value TEXT);"
-                c.execute(q)
-                conn.commit()
-            with pytest.raises(DBTargetPropMissingError):
-                DBConnector.read_root(dp / "test.db")
+        dp = fake_files_dir
+        # Check raises when no fs_meta table
+        with pytest.raises(DBNoFsMetaTableError):
+            DBConnector.read_root(dp / "test.db")
+        # Check raises when no 'root' in property column
+        with closing(sql.connect(dp / "test.db")) as conn:
+            c = conn.cursor()
+            q = "CREATE TABLE fs_meta (property TEXT PRIMARY KEY, value TEXT);"
+            c.execute(q)
+            conn.commit()
+        with pytest.raises(DBTargetPropMissingError):
+            DBConnector.read_root(dp / "test.db")
 
 
 class TestInit:
@@ -510,11 +497,11 @@ class TestInit:
         """Raises type errors on:
         1. path is not a PurePath or str: TypeError
         2. root is not a PurePath or str: TypeError"""
-        with fake_files_dir as dp:
-            with pytest.raises(TypeError):
-                DBConnector(1)  # type: ignore
-            with pytest.raises(TypeError):
-                DBConnector(dp / ".scout.db", 1)  # type: ignore
+        dp = fake_files_dir
+        with pytest.raises(TypeError):
+            DBConnector(1)  # type: ignore
+        with pytest.raises(TypeError):
+            DBConnector(dp / ".scout.db", 1)  # type: ignore
 
     @pytest.mark.parametrize(
         "path, root, raises",
@@ -534,40 +521,40 @@ class TestInit:
         3. path exists and is not a sqlite file: DBFileOccupiedError
         4. path exists and is not a scout db file, but is sqlite: DBFileOccupiedError
         """
-        with fake_files_dir as dp:
-            with pytest.raises(raises):
-                root = dp / root if root else None
-                DBConnector(dp / path, root)
+        dp = fake_files_dir
+        with pytest.raises(raises):
+            root = dp / root if root else None
+            DBConnector(dp / path, root)
 
     def testSuccessInitDB(self, fake_files_dir):
         """
         Should successfully initialize the DBConnector object with
         a newly initialized scout db file.
         """
-        with fake_files_dir as dp:
-            path, root = dp / "new.db", dp / "dir"
-            db = DBConnector(path, root)
-            assert db.path == path
-            assert db.root == root
-            with sql.connect(path) as conn:
-                c = conn.cursor()
-                c.execute("SELECT value FROM fs_meta WHERE property='root';")
-                assert c.fetchone()[0] == str(root)
+        dp = fake_files_dir
+        path, root = dp / "new.db", dp / "dir"
+        db = DBConnector(path, root)
+        assert db.path == path
+        assert db.root == root
+        with closing(sql.connect(path)) as conn:
+            c = conn.cursor()
+            c.execute("SELECT value FROM fs_meta WHERE property='root';")
+            assert c.fetchone()[0] == str(root)
 
     def testSuccessReadRoot(self, fake_files_dir):
         """
         Should successfully initialize the DBConnector object with
         an existing scout db file.
         """
-        with fake_files_dir as dp:
-            path, root = dp / "base.scout.db", dp / "dir"
-            db = DBConnector(path, root)
-            assert db.path == path
-            assert db.root == root
-            with sql.connect(path) as conn:
-                c = conn.cursor()
-                c.execute("SELECT value FROM fs_meta WHERE property='root';")
-                assert c.fetchone()[0] == str(root)
+        dp = fake_files_dir
+        path, root = dp / "base.scout.db", dp / "dir"
+        db = DBConnector(path, root)
+        assert db.path == path
+        assert db.root == root
+        with closing(sql.connect(path)) as conn:
+            c = conn.cursor()
+            c.execute("SELECT value FROM fs_meta WHERE property='root';")
+            assert c.fetchone()[0] == str(root)
 
 
 class TestPathHelpers:
@@ -579,6 +566,26 @@ class TestPathHelpers:
         assert fn(Dir("a/b")) == fn(PP("a/b"))
         assert fn(Dir("/test/root/a/b")) == fn(PP("/test/root/a/b"))
 
+    def testNormCachedPerRoot(self, mock_db_conn):
+        """normalize_path memoizes per (root, path) and never mixes roots."""
+        normalize_to_root.cache_clear()
+        fn = mock_db_conn.normalize_path
+        assert fn("/test/root/a/b") == PP("a/b")
+        assert fn(Dir("/test/root/a/b")) == PP("a/b")
+        assert normalize_to_root.cache_info().hits == 1
+        mock_db_conn.root = PP("/test")
+        assert fn("/test/root/a/b") == PP("root/a/b")
+        assert normalize_to_root.cache_info().misses == 2
+
+    def testDenormShared(self, mock_db_conn):
+        """denormalize_path hands out one shared PurePath per (root, path)."""
+        join_root.cache_clear()
+        fn = mock_db_conn.denormalize_path
+        assert fn("a/b") is fn("a/b")
+        assert fn("a/b") == PP("/test/root/a/b")
+        mock_db_conn.root = PP("/test")
+        assert fn("a/b") == PP("/test/a/b")
+
     # TODO: Stick to one input type and use test case to ensure diff types return same output
     @pytest.mark.parametrize(
         "path, expect",
@@ -613,14 +620,44 @@ class TestPathHelpers:
         """
         assert mock_db_conn.normalize_path(path) == expect
 
+    @pytest.mark.parametrize(
+        "path, expect",
+        [
+            ("a", True),
+            ("a/b/c", True),
+            ("", False),
+            (".", False),
+            ("/test/root/a", False),
+            ("a/b/", False),
+            ("a//b", False),
+            ("a/./b", False),
+            ("./a", False),
+            ("../a", False),
+            ("a/..", False),
+            ("a..b/c.d", False),
+            ("a/b.c", True),
+            ("a/.b", True),
+            (PP("a/b"), False),
+            (Dir("a/b"), False),
+        ],
+    )
+    def testIsNormalized(self, mock_db_conn, path, expect):
+        """is_normalized should only accept str paths that normalize_path
+        returns unchanged, and whenever it does they must agree."""
+        assert mock_db_conn.is_normalized(path) == expect
+        if expect:
+            assert str(mock_db_conn.normalize_path(path)) == path
+
     @pytest.mark.parametrize(
         "path,raises",
         [
             ("/test", DBPathOutsideTargetError),
             ("/out/root", DBPathOutsideTargetError),
             ("../a", DBPathNotSupportedError),
+            ("a..b", DBPathNotSupportedError),
+            ("/test/root/a..b", DBPathNotSupportedError),
         ],
-        ids=["parent", "out", ".."],
+        ids=["parent", "out", "..", "rel ..name", "abs ..name"],
     )
     def testNormRaise(self, mock_db_conn, path, raises):
         """
@@ -629,6 +666,7 @@ class TestPathHelpers:
             1. Ancestor paths to root
             2. Parallel to root
             3. Relative ancestor
+            4. Relative & absolute names with '..' in them, fast path or not
         """
         with pytest.raises(raises):
             mock_db_conn.normalize_path(path)
@@ -672,8 +710,10 @@ class TestPathHelpers:
             ("/test", DBPathOutsideTargetError),
             ("/out/root", DBPathOutsideTargetError),
             ("../a", DBPathNotSupportedError),
+            ("a..b", DBPathNotSupportedError),
+            ("/test/root/a..b", DBPathNotSupportedError),
         ],
-        ids=["parent", "out", ".."],
+        ids=["parent", "out", "..", "rel ..name", "abs ..name"],
     )
     def testDenormRaise(self, mock_db_conn, path, raises):
         """
@@ -681,6 +721,7 @@ class TestPathHelpers:
         1. Ancestor paths to root
         2. Parallel to root
         3. Relative ancestor
+        4. Relative & absolute names with '..' in them, fast path or not
         """
         with pytest.raises(raises):
             mock_db_conn.denormalize_path(path)
@@ -700,44 +741,109 @@ class TestPathHelpers:
         ppath, expect = PP(path), [PP(path) for path in exp]
         assert mock_db_conn.ancestor_paths(path) == expect
         assert mock_db_conn.ancestor_paths(ppath) == expect
+        assert mock_db_conn.ancestor_path_strs(path) == exp
         root = mock_db_conn.root
         path, ppath = str(root / path), root / ppath
         assert mock_db_conn.ancestor_paths(path) == expect
         assert mock_db_conn.ancestor_paths(ppath) == expect
+        assert mock_db_conn.ancestor_path_strs(ppath) == exp
 
 
 class TestConnect:
     def testConnect(self, bare_db):
-        with bare_db as db:
-            with db.connect() as conn:
-                c = conn.cursor()
-                c.execute("SELECT value FROM fs_meta WHERE property='root';")
-                root = PP(c.fetchone()[0])
-                assert db.root == root
-                assert db.path == root.parent / "test.db"
+        db = bare_db
+        with db.connect() as conn:
+            c = conn.cursor()
+            c.execute("SELECT value FROM fs_meta WHERE property='root';")
+            root = PP(c.fetchone()[0])
+            assert db.root == root
+            assert db.path == root.parent / "test.db"
 
     def testConnectSQLExec(self, bare_db):
-        with bare_db as db:
-            with db.connect() as conn:
-                conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
-                conn.execute("INSERT INTO test (txt) VALUES ('Hello World!');")
-                conn.execute("INSERT INTO test (txt) VALUES ('foobar');")
-                conn.commit()
-            with sql.connect(db.path) as conn:
-                c = conn.cursor()
-                c.execute("SELECT * FROM test;")
-                assert c.fetchall() == [(1, "Hello World!"), (2, "foobar")]
-                c.execute("SELECT value FROM fs_meta WHERE property='root';")
-                assert PP(c.fetchone()[0]) == db.root
+        db = bare_db
+        with db.connect() as conn:
+            conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
+            conn.execute("INSERT INTO test (txt) VALUES ('Hello World!');")
+            conn.execute("INSERT INTO test (txt) VALUES ('foobar');")
+            conn.commit()
+        with closing(sql.connect(db.path)) as conn:
+            c = conn.cursor()
+            c.execute("SELECT * FROM test;")
+            assert c.fetchall() == [(1, "Hello World!"), (2, "foobar")]
+            c.execute("SELECT value FROM fs_meta WHERE property='root';")
+            assert PP(c.fetchone()[0]) == db.root
+
+    def testConnectCloses(self, bare_db):
+        """Connection should be closed, not just committed, after the context."""
+        db = bare_db
+        with db.connect() as conn:
+            conn.execute("SELECT 1;")
+        with pytest.raises(sql.ProgrammingError):
+            conn.execute("SELECT 1;")
+
+    def testConnectMemory(self, tmp_path):
+        """In-memory dbs hand out their one connection & keep it open until close."""
+        db = DBConnector(MEMORY_PATH, tmp_path)
+        assert db.path == PP(MEMORY_PATH)
+        assert db.root == tmp_path
+        assert not os.path.exists(MEMORY_PATH)
+        with db.connect() as conn:
+            conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
+        with db.connect() as again:
+            assert again is conn
+            c = again.execute("SELECT value FROM fs_meta WHERE property='root';")
+            assert PP(c.fetchone()[0]) == tmp_path
+        assert db.table_exists("test")
+        db.close()
+        with pytest.raises(sql.ProgrammingError):
+            conn.execute("SELECT 1;")
+
+    def testFromConnection(self, tmp_path):
+        """Wraps a backup copy of an in-memory db without re-initializing it."""
+        src = DBConnector(MEMORY_PATH, tmp_path)
+        with src.connect() as conn:
+            conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
+        dest = sql.connect(MEMORY_PATH)
+        src.mem_conn.backup(dest)
+        src.close()
+        db = DBConnector.from_connection(dest, tmp_path)
+        assert (db.path, db.root) == (PP(MEMORY_PATH), tmp_path)
+        with db.connect() as conn:
+            assert conn is dest
+            c = conn.execute("SELECT COUNT(*) FROM fs_meta;")
+            assert c.fetchone() == (1,)
+        assert db.table_exists("test")
+        db.close()
+
+    def testConnectMemoryNeedsRoot(self, tmp_path):
+        """There's no file to read or default the root from, so it's required."""
+        with pytest.raises(TypeError):
+            DBConnector(MEMORY_PATH)
+        with pytest.raises(DBRootNotDirError):
+            DBConnector(MEMORY_PATH, tmp_path / "missing")
 
 
 class TestTableExists:
     def testTableExists(self, bare_db):
-        with bare_db as db:
-            with db.connect() as conn:
-                assert not db.table_exists("test")
-                conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
-                conn.commit()
-            assert db.table_exists("test")
+        db = bare_db
+        with db.connect() as conn:
+            assert not db.table_exists("test")
+            conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
+            conn.commit()
+        assert db.table_exists("test")
+        assert db.table_exists("fs_meta")
+        assert not db.table_exists("foobar")
+
+    def testTableExistsCached(self, tmp_path):
+        """Tables found once are answered without a query, missing ones aren't cached."""
+        db = DBConnector(MEMORY_PATH, tmp_path)
+        assert db.table_exists("fs_meta")
+        assert not db.table_exists("test")
+        with patch.object(db, "connect") as mock_connect:
             assert db.table_exists("fs_meta")
-            assert not db.table_exists("foobar")
+            mock_connect.assert_not_called()
+        with db.connect() as conn:
+            conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, txt TEXT);")
+        assert db.table_exists("test")
+        assert DBConnector.known_tables == frozenset()
+        db.close()
@@ -1,44 +1,190 @@
 # TODO: Test constraints & indices on tables
-from contextlib import contextmanager
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
 import os
-from pathlib import PurePath
+from pathlib import Path, PurePath
 import pytest
-from unittest.mock import patch
-import tempfile
+import sqlite3
+import stat
+from unittest.mock import Mock, patch
 from typing import List, Tuple
 
-from lib.handler.dir_repo import DirRepo
+from lib.handler.dir_repo import DirRepo, DEFAULT_DEPTH
+from lib.handler.dir_repo import DIR_ANCESTOR_INDEX, DIR_ANCESTOR_DIR_INDEX
 from lib.model.dir import Dir
-from lib.handler.db_connector import DBConnector
+from lib.handler.db_connector import DBConnector, MEMORY_PATH
 from lib.handler.db_connector import DBPathOutsideTargetError
 
 PP = PurePath
 
-MOD_REPO = "lib.handler.dir_repo.DirRepo"
-MOD_DBC = "lib.handler.db_connector.DBConnector"
+
+# Pragma schema queries come in form of:
+# list of (cid, name, type, notnull, dflt_value, key) per column
+# Bools are represented as 0|1, but python evaluates them as False|True
+EXPECT_DIR_SCHEMA = (
+    (0, "id", "INTEGER", 1, None, 1),
+    (1, "path", "TEXT", 1, None, 0),
+)
+EXPECT_DIR_ANC_SCHEMA = (
+    (0, "dir_id", "INTEGER", 1, None, 1),
+    (1, "ancestor_id", "INTEGER", 1, None, 2),
+    (2, "depth", "INTEGER", 1, None, 0),
+)
+
+# Leaf paths of the test_repo tree, already normalized so adding them
+# needs no join onto, or normalizing against, a root
+TREE_PATHS = ("a/b/c", "a/d", "a/e", "f/g", "f/h")
+# Rows of the dir & dir_ancestor tables holding the test_repo tree.
+# Sets so the checks don't depend on the order rows come back in.
+EXPECT_TREE_DIRS = frozenset(
+    {
+        (1, "a"),
+        (2, "a/b"),
+        (3, "a/b/c"),
+        (4, "a/d"),
+        (5, "a/e"),
+        (6, "f"),
+        (7, "f/g"),
+        (8, "f/h"),
+    }
+)
+EXPECT_TREE_DIR_ANCS = frozenset(
+    {
+        (1, 1, 0),
+        (2, 2, 0),
+        (2, 1, 1),
+        (3, 3, 0),
+        (3, 2, 1),
+        (3, 1, 2),
+        (4, 4, 0),
+        (4, 1, 1),
+        (5, 5, 0),
+        (5, 1, 1),
+        (6, 6, 0),
+        (7, 7, 0),
+        (7, 6, 1),
+        (8, 8, 0),
+        (8, 6, 1),
+    }
+)
+
+# Every column of both dir tables, joined on sqlite_master so one query
+# covers both the table existing & its schema
+SCHEMA_QUERY = """
+    SELECT m.name, p.cid, p.name, p.type, p."notnull", p.dflt_value, p.pk
+    FROM sqlite_master m JOIN pragma_table_info(m.name) p
+    WHERE m.type = 'table' AND m.name IN ('dir', 'dir_ancestor')
+    ORDER BY m.name, p.cid
+"""
+
+
+def read_tree_rows(db: DBConnector) -> Tuple[List[Tuple], List[Tuple]]:
+    """Reads every dir & dir_ancestor row, in id then depth order, on one connection."""
+    with db.connect() as conn:
+        conn.row_factory = None  # Plain tuples, whatever the connector set
+        d_rows = conn.execute("SELECT id, path FROM dir ORDER BY id").fetchall()
+        da_rows = conn.execute(
+            "SELECT dir_id, ancestor_id, depth FROM dir_ancestor ORDER BY dir_id, depth"
+        ).fetchall()
+    return d_rows, da_rows
+
+
+def read_schemas(conn: sqlite3.Connection) -> dict:
+    """Reads SCHEMA_QUERY into a tuple of column rows per table name."""
+    schemas = {"dir": (), "dir_ancestor": ()}
+    for table, *column in conn.execute(SCHEMA_QUERY):
+        schemas[table] += (tuple(column),)
+    return schemas
 
 
 ### Module fixtures
-@contextmanager
-def temp_dir_context():
-    with tempfile.TemporaryDirectory() as tempdir:
-        yield PP(tempdir)
+def build_template(root: Path, build) -> DBConnector:
+    """Builds a scout db in memory to clone test dbs from."""
+    db = DBConnector(MEMORY_PATH, root)
+    build(db)
+    return db
+
+
+@pytest.fixture(scope="session")
+def mem_root(tmp_path_factory) -> Path:
+    """One real directory all the in-memory test dbs are rooted at."""
+    return tmp_path_factory.mktemp("mem_root")
+
+
+@pytest.fixture(scope="session")
+def test_db_template(mem_root):
+    """Scout db holding the test_repo tree."""
+    db = build_template(mem_root, seed_test_tree)
+    yield db
+    db.close()
+
+
+def create_init_variant(db: DBConnector, dir: bool, anc: bool) -> None:
+    """Creates stand-in dir & dir_ancestor tables, each only if asked to."""
+    with db.connect() as conn:
+        if dir:
+            conn.execute("CREATE TABLE dir (id INTEGER PRIMARY KEY, path TEXT)")
+            conn.execute("INSERT INTO dir (path) VALUES ('dir')")
+        if anc:
+            q = "CREATE TABLE dir_ancestor (id INTEGER PRIMARY KEY, path TEXT)"
+            conn.execute(q)
+            conn.execute("INSERT INTO dir_ancestor (path) VALUES ('anc')")
+
+
+@pytest.fixture(scope="session")
+def init_variant_templates(mem_root):
+    """
+    Scout db for each (dir, anc) combination of
+    which DirRepo tables already exist, built once for the init tests.
+    """
+    templates = {}
+    for dir in (False, True):
+        for anc in (False, True):
+            build = lambda db: create_init_variant(db, dir, anc)  # noqa: E731
+            templates[(dir, anc)] = build_template(mem_root, build)
+    yield templates
+    for db in templates.values():
+        db.close()
 
 
 @pytest.fixture
-@contextmanager
-def base_dbconn():
-    with temp_dir_context() as tempdir:
-        db = DBConnector(tempdir / ".scout.db")
-        yield db
+def file_dbconn(tmp_path):
+    """Scout db in a file of its own, for the few tests about file semantics."""
+    return DBConnector(tmp_path / ".scout.db")
+
+
+@pytest.fixture(scope="session")
+def base_db_template(mem_root):
+    """Scout db with only the fs_meta table."""
+    db = build_template(mem_root, lambda db: None)
+    yield db
+    db.close()
+
+
+@pytest.fixture(scope="session")
+def base_repo_template(mem_root):
+    """Scout db with the fs_meta & empty DirRepo tables."""
+    db = build_template(mem_root, DirRepo)
+    yield db
+    db.close()
 
 
 @pytest.fixture
-@contextmanager
-def base_repo(base_dbconn):
-    with base_dbconn as db:
-        repo = DirRepo(db)
-        yield repo
+def base_dbconn(base_db_template, clone_db):
+    """Fresh in-memory scout db with only the fs_meta table."""
+    db = clone_db(base_db_template)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def base_repo(base_repo_template, clone_db):
+    """DirRepo over a fresh in-memory db with its tables already created."""
+    db = clone_db(base_repo_template)
+    yield DirRepo(db)
+    db.close()
 
 
 def same_rows(real: List[Tuple], expected: List[Tuple], pk_index: int = 0) -> bool:
@@ -54,21 +200,32 @@ def same_rows(real: List[Tuple], expected: List[Tuple], pk_index: int = 0) -> bo
         pk_index (int, optional): The index of the primary key in the tuple. Default is 0.
 
     Returns:
-        bool: True if both lists have the same primary keys in the same order, False otherwise.
+        bool: True if both lists have the same primary keys, as many times each
+            in any order, False otherwise.
     """
     if len(real) != len(expected):
         return False
 
-    real_keys = {row[pk_index] for row in real}
-    expected_keys = {row[pk_index] for row in expected}
+    key = itemgetter(pk_index)
+    return Counter(map(key, real)) == Counter(map(key, expected))
 
-    return real_keys == expected_keys
+
+def seed_test_tree(db: DBConnector) -> None:
+    """
+    Loads the rows of the directory tree documented in test_repo straight
+    into the db, one executemany per table in a single transaction.
+    Bypasses DirRepo.add so the fixtures don't depend on it being correct.
+    """
+    DirRepo(db)  # Creates the tables
+    with db.connect() as conn:
+        conn.executemany("INSERT INTO dir VALUES (?, ?)", sorted(EXPECT_TREE_DIRS))
+        conn.executemany(
+            "INSERT INTO dir_ancestor VALUES (?, ?, ?)", sorted(EXPECT_TREE_DIR_ANCS)
+        )
 
 
-# TODO: Should teardown be added?
 @pytest.fixture
-@contextmanager
-def test_repo(base_repo):
+def test_repo(test_db_template, clone_db):
     """
     Create a DirRepo with a preset directory tree for testing like so:
     Dir Tree: (id)
@@ -77,16 +234,30 @@ def test_repo(base_repo):
            └─ e(5)/
     f(6)/ ─┬─ g(7)/
            └─ h(8)/
-    NOTE: Uses DirRepo.add() to create the tree in the database.
-            Should be used AFTER asserting DirRepo.add() works.
+    NOTE: The rows are loaded as is, TestAdd checks add() & add_many() build them.
+    NOTE: The tree is built once per session & each test gets a copy of it.
     """
-    with base_repo as repo:
-        repo.add(Dir(path=repo.db.root / "a/b/c"))
-        repo.add(Dir(path=repo.db.root / "a/d"))
-        repo.add(Dir(path=repo.db.root / "a/e"))
-        repo.add(Dir(path=repo.db.root / "f/g"))
-        repo.add(Dir(path=repo.db.root / "f/h"))
-        yield repo
+    db = clone_db(test_db_template)
+    yield DirRepo(db)
+    db.close()
+
+
+@pytest.fixture(scope="module")
+def seeded_db(test_db_template, clone_db):
+    """Copy of the test_repo tree's db shared per module for read-only tests."""
+    db = clone_db(test_db_template)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def seeded_repo(seeded_db):
+    """
+    Same tree as test_repo but on the db shared per module for read-only tests.
+    Each test gets its own DirRepo so no cached state carries between tests.
+    NOTE: Never insert through it, use test_repo for tests that write.
+    """
+    return DirRepo(seeded_db)
 
 
 class Dirs:
@@ -102,68 +273,71 @@ class Dirs:
         self.h = Dir(id=8, path=root / "f/h")
 
 
+# Lookup args for the get methods, each case leaving out the arg the one
+# before it wins with, to check resolve_lookup's id > path > dir order
+LOOKUPS = [
+    dict(id=1, path="a/b/c", dir=Dir(id=6, path="f/h")),
+    dict(path="a/b/c", dir=Dir(id=6, path="f/h")),
+    dict(dir=Dir(id=6, path="f/h")),
+    dict(dir=Dir(path="f/h")),
+]
+LOOKUP_IDS = ["id", "path", "dir_id", "dir_path"]
+
+
+@lru_cache(maxsize=None)
+def dirs_for(root: PP) -> Dirs:
+    """
+    The test tree's Dirs for a root, built once per root & shared after.
+    NOTE: Only compare against them, never mutate the shared Dirs.
+    """
+    return Dirs(root)
+
+
+@pytest.mark.slow
 class TestFixtures:
-    """Test fixtures for use in later tests"""
-
-    def testTempDirContext(self):
-        with temp_dir_context() as tempdir:
-            assert os.path.isdir(tempdir)
-            with open(tempdir / "foobar.txt", "w") as f:
-                f.write("foobar")
-            with open(tempdir / "foobar.txt", "r") as f:
-                assert f.read() == "foobar"
-
-    def testTempDirContextCleanup(self):
-        """Ensure cleanup of temporary directory after context"""
-        with temp_dir_context() as tempdir:
-            with pytest.raises(FileNotFoundError):
-                with open(tempdir / "foobar.txt", "r") as f:
-                    f.read()
-        assert not os.path.isdir(tempdir)
-
-    def testBaseDBConn(self, base_dbconn):
-        with base_dbconn as db:
-            assert db.root == db.path.parent
-            assert os.path.isfile(db.path)
-            assert os.path.isdir(db.root)
-            assert DBConnector.read_root(db.path) == db.root
-            assert DBConnector.is_scout_db_file(db.path)
+    """
+    Test fixtures for use in later tests.
+    Smoke tests of the test scaffolding only, skip them with -m "not slow".
+    """
+
+    def testFileDBConn(self, file_dbconn):
+        assert file_dbconn.root == file_dbconn.path.parent
+        db_stat = os.stat(file_dbconn.path)
+        assert stat.S_ISREG(db_stat.st_mode) and db_stat.st_size > 0
+        assert stat.S_ISDIR(os.stat(file_dbconn.root).st_mode)
+        assert DBConnector.read_root(file_dbconn.path) == file_dbconn.root
+        assert DBConnector.is_scout_db_file(file_dbconn.path)
+
+    def testBaseDBConn(self, base_dbconn, mem_root):
+        assert base_dbconn.path == PP(MEMORY_PATH)
+        assert base_dbconn.root == mem_root
+        assert not os.path.exists(MEMORY_PATH)
+        assert base_dbconn.table_exists("fs_meta")
 
     def testBaseRepo(self, base_repo):
-        with base_repo as repo:
-            assert repo.db.root == repo.db.path.parent
-            assert repo.db.path == repo.db.root / ".scout.db"
-            assert os.path.isfile(repo.db.path)
-            assert os.path.isdir(repo.db.root)
-            with repo.db.connect() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                tables = cursor.fetchall()
-                assert ("dir",) in tables
-                assert ("dir_ancestor",) in tables
-
-    def testTestRepo(self, test_repo):
-        d_rows = []
-        da_rows = []
-        with test_repo as repo:
-            with repo.db.connect() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM dir")
-                d_rows = cursor.fetchall()
-                cursor.execute("SELECT * FROM dir_ancestor")
-                da_rows = cursor.fetchall()
-        d_expect = [(1, "a"), (2, "a/b"), (3, "a/b/c")]
-        d_expect += [(4, "a/d"), (5, "a/e"), (6, "f"), (7, "f/g"), (8, "f/h")]
-        assert d_rows == d_expect
-        da_expect = [(1, 1, 0)]
-        da_expect += [(2, 2, 0), (2, 1, 1)]
-        da_expect += [(3, 3, 0), (3, 2, 1), (3, 1, 2)]
-        da_expect += [(4, 4, 0), (4, 1, 1)]
-        da_expect += [(5, 5, 0), (5, 1, 1)]
-        da_expect += [(6, 6, 0)]
-        da_expect += [(7, 7, 0), (7, 6, 1)]
-        da_expect += [(8, 8, 0), (8, 6, 1)]
-        assert da_rows == da_expect
+        with base_repo.db.connect() as conn:
+            schemas = read_schemas(conn)
+        assert schemas["dir"] == EXPECT_DIR_SCHEMA
+        assert schemas["dir_ancestor"] == EXPECT_DIR_ANC_SCHEMA
+        # Writes persist across connect calls on the one in-memory connection
+        base_repo.insert_dir("a")
+        assert base_repo.select_dir_where_path("a") == (1, "a")
+
+    def testTestRepo(self, test_repo, mem_root):
+        assert test_repo.db.path == PP(MEMORY_PATH)
+        with test_repo.db.connect() as conn:
+            q = "SELECT value FROM fs_meta WHERE property = 'root'"
+            assert conn.execute(q).fetchone() == (str(mem_root),)
+        d_rows, da_rows = read_tree_rows(test_repo.db)
+        assert set(d_rows) == EXPECT_TREE_DIRS
+        assert set(da_rows) == EXPECT_TREE_DIR_ANCS
+
+    def testSeededRepo(self, seeded_repo):
+        """Seeded repo holds the test_repo tree in its own in-memory db."""
+        expect = dirs_for(seeded_repo.db.root)
+        assert seeded_repo.db.path == PP(MEMORY_PATH)
+        assert seeded_repo.get_descendants(path="f") == [expect.g, expect.h]
+        assert seeded_repo.getone(id=3) == expect.c
 
     def testSameRowEqual(self):
         real = [(1, "a", b"dead"), (2, "b", b"beef"), (3, "c", b"cafe")]
@@ -184,6 +358,10 @@ class TestFixtures:
             [(1, "a"), (2, "b"), (3, "c")], [(1, "a"), (2, "b"), (3, "c")], pk_index=1
         )
 
+    def testSameRowDupePKCounts(self):
+        assert same_rows([(2,), (1,), (1,)], [(1,), (1,), (2,)])
+        assert not same_rows([(1,), (1,), (2,)], [(1,), (2,), (2,)])
+
     def testSameRowEmpty(self):
         assert same_rows([], [])
         assert not same_rows([(1,)], [])
@@ -192,103 +370,60 @@ class TestFixtures:
 class TestInitHelpers:
     """Tests helper methods __init__ uses, NOT __init__ itself."""
 
-    def testCreateDirTable(self, base_dbconn):
-        # Arrange
-        table_query = "SELECT name FROM sqlite_master WHERE type='table';"
-        # Pragma schema queries come in form of:
-        # list of (cid, name, type, notnull, dflt_value, key) per column
-        schema_query = "PRAGMA table_info(dir)"
-        expect = [
-            # Expected schema is list for every column with tuple of:
-            # (num: int, name: str, dtype: str, nullable: bool, prime_key: bool)
-            # Bools are represented as 0|1, but python evaluates them as False|True
-            (0, "id", "INTEGER", 1, None, 1),
-            (1, "path", "TEXT", 1, None, 0),
-        ]
-        # Act
-        with base_dbconn as db:
-            DirRepo.create_dir_table(db)
-            with db.connect() as conn:
-                cursor = conn.cursor()
-
-                # Assert
-                cursor.execute(table_query)
-                tables = cursor.fetchall()
-                cursor.execute(schema_query)
-                schema = cursor.fetchall()
-
-                # Check for table name
-                assert ("dir",) in tables
-
-                # Check column count
-                assert len(schema) == len(expect)
-
-                # Check id column
-                assert schema[0] == expect[0]
-
-                # Check path column
-                assert schema[1] == expect[1]
-
-    def testCreateDirAncTable(self, base_dbconn):
-        # Arrange
-        table_query = "SELECT name FROM sqlite_master WHERE type='table';"
-        # Pragma schema queries come in form of:
-        # list of (cid, name, type, notnull, dflt_value, key) per column
-        schema_query = "PRAGMA table_info(dir_ancestor)"
-        expect = [
-            # Expected schema is list for every column with tuple of:
-            # (num: int, name: str, dtype: str, nullable: bool, prime_key: bool)
-            # Bools are represented as 0|1, but python evaluates them as False|True
-            (0, "dir_id", "INTEGER", True, None, 1),
-            (1, "ancestor_id", "INTEGER", 1, None, 2),
-            (2, "depth", "INTEGER", True, None, False),
-        ]
+    def testCreateTables(self, base_dbconn):
+        """Both creators on one db, every column of both tables in one query"""
         # Act
-        with base_dbconn as db:
-            DirRepo.create_dir_ancestor_table(db)
-            with db.connect() as conn:
-                cursor = conn.cursor()
-
-                # Assert
-                cursor.execute(table_query)
-                tables = cursor.fetchall()
-                cursor.execute(schema_query)
-                schema = cursor.fetchall()
-
-                # Check for table name
-                assert ("dir_ancestor",) in tables
+        DirRepo.create_dir_table(base_dbconn)
+        DirRepo.create_dir_ancestor_table(base_dbconn)
+        with base_dbconn.connect() as conn:
+            schemas = read_schemas(conn)
 
-                # Check column count
-                assert len(schema) == len(expect)
+        # Assert - a missing table shows up as a missing schema
+        assert schemas["dir"] == EXPECT_DIR_SCHEMA
+        assert schemas["dir_ancestor"] == EXPECT_DIR_ANC_SCHEMA
 
-                # Check id column
-                assert schema[0] == expect[0]
-
-                # Check path column
-                assert schema[1] == expect[1]
+    @pytest.mark.parametrize(
+        "index,expect",
+        [
+            (DIR_ANCESTOR_INDEX, ["ancestor_id", "depth", "dir_id"]),
+            (DIR_ANCESTOR_DIR_INDEX, ["dir_id", "depth", "ancestor_id"]),
+        ],
+    )
+    def testCreateDirAncIndex(self, base_dbconn, index, expect):
+        """Both ends of the closure get a covering index ordered by depth."""
+        DirRepo.create_dir_ancestor_table(base_dbconn)
+        with base_dbconn.connect() as conn:
+            cols = conn.execute(f"PRAGMA index_info({index})").fetchall()
+            assert [col[2] for col in cols] == expect
 
 
 class TestInit:
     """Test cases for DirRepo.__init__"""
 
-    def testSetsMembers(self, base_dbconn):
+    def testSetsMembers(self):
         """__init__ sets member variables correctly"""
-        with base_dbconn as db:
-            repo = DirRepo(db)
-            assert repo.db.path == db.path
-            assert repo.db.root == db.root
+        # No real database needed, only that the connector gets assigned
+        db = Mock(spec=DBConnector)
+        db.path = PP("/fake/.scout.db")
+        db.root = PP("/fake")
+        db.table_exists = Mock(return_value=True)
+        repo = DirRepo(db)
+        assert repo.db is db
+        assert repo.db.path == db.path
+        assert repo.db.root == db.root
 
-    def testCallsTableExists(self, base_dbconn):
+    def testCallsTableExists(self, base_dbconn, monkeypatch):
         """__init__ calls DBConnector.table_exists for dir table"""
-        # Arrange
-        with base_dbconn as db:
-            fn_str = "lib.handler.db_connector.DBConnector.table_exists"
-            with patch(fn_str) as mock_fn:
-                # Act
-                DirRepo(db)
-                # Assert
-                mock_fn.assert_any_call("dir")
-                mock_fn.assert_any_call("dir_ancestor")
+        # Arrange - a spy that records the table names & calls through
+        calls = []
+        table_exists = base_dbconn.table_exists
+        spy = lambda name: (calls.append(name), table_exists(name))[1]
+        monkeypatch.setattr(base_dbconn, "table_exists", spy)
+        # Act
+        DirRepo(base_dbconn)
+        # Assert
+        assert "dir" in calls
+        assert "dir_ancestor" in calls
 
     @pytest.mark.parametrize(
         "dir,anc",
@@ -303,7 +438,9 @@ class TestInit:
     )
     def testCallsRightCreates(
         self,
-        base_dbconn,
+        init_variant_templates,
+        clone_db,
+        monkeypatch,
         dir,
         anc,
     ):
@@ -313,23 +450,16 @@ class TestInit:
         dir (dir) and anc (ancestor) table existence.
         Then the expected calls are the inverse of whether the table exists.
         """
-        with base_dbconn as db:
-            with db.connect() as conn:
-                if dir:
-                    conn.execute("CREATE TABLE dir (id INTEGER PRIMARY KEY, path TEXT)")
-                    conn.execute("INSERT INTO dir (path) VALUES ('dir')")
-                if anc:
-                    q = "CREATE TABLE dir_ancestor (id INTEGER PRIMARY KEY, path TEXT)"
-                    conn.execute(q)
-                    conn.execute("INSERT INTO dir_ancestor (path) VALUES ('anc')")
-                conn.commit()
-            with (
-                patch(f"{MOD_REPO}.create_dir_table") as mock_dir,
-                patch(f"{MOD_REPO}.create_dir_ancestor_table") as mock_anc,
-            ):
-                DirRepo(db)
-                assert mock_dir.called == (not dir)
-                assert mock_anc.called == (not anc)
+        db = clone_db(init_variant_templates[(dir, anc)])
+        created = []
+        create_dir = staticmethod(lambda db: created.append("dir"))
+        create_anc = staticmethod(lambda db: created.append("anc"))
+        monkeypatch.setattr(DirRepo, "create_dir_table", create_dir)
+        monkeypatch.setattr(DirRepo, "create_dir_ancestor_table", create_anc)
+        DirRepo(db)
+        db.close()
+        assert ("dir" in created) == (not dir)
+        assert ("anc" in created) == (not anc)
 
 
 class TestInsertUtils:
@@ -337,18 +467,13 @@ class TestInsertUtils:
         """DirRepo.insert_into_dir() inserts correct records & returns correct id.
         Includes absolute and relative to root paths to check they get normalized.
         Also includes duplicate paths to ensure they don't get added twice."""
-        ids = []
-        with base_repo as repo:
-            root = repo.db.root
-            ids.append(repo.insert_dir(f"{root}/a"))
-            ids.append(repo.insert_dir("a/b"))
-            ids.append(repo.insert_dir("a/b"))
-            ids.append(repo.insert_dir("a/b/c"))
-            ids.append(repo.insert_dir("f/g"))
-            ids.append(repo.insert_dir(f"{root}/f"))
-            ids.append(repo.insert_dir(f"{root}/f"))
-            with repo.db.connect() as conn:
-                rows = conn.execute("SELECT * FROM dir").fetchall()
+        root = base_repo.db.root
+        paths = [f"{root}/a", "a/b", "a/b", "a/b/c", "f/g", f"{root}/f"]
+        ids = base_repo.insert_dirs(paths)
+        # One dupe through the single insert path too
+        ids.append(base_repo.insert_dir(f"{root}/f"))
+        with base_repo.db.connect() as conn:
+            rows = conn.execute("SELECT * FROM dir").fetchall()
         assert len(rows) == 5
         assert rows[0] == (1, "a")
         assert rows[1] == (2, "a/b")
@@ -357,59 +482,77 @@ class TestInsertUtils:
         assert rows[4] == (5, "f")
         assert ids == [1, 2, 2, 3, 4, 5, 5]
 
+    def testInsertDirsSameAsInsertDir(self, base_repo):
+        """DirRepo.insert_dirs() gives the ids insert_dir would, incl. existing ones"""
+        assert base_repo.insert_dir("f") == 1
+        assert base_repo.insert_dirs(["a", "f", "a/b", "a"]) == [2, 1, 3, 2]
+        assert base_repo.insert_dirs([]) == []
+        assert base_repo.insert_dir("a/b") == 3
+
     # TODO: Improve test coverage
     def testInsertDirRaise(self, base_repo):
         """DirRepo.insert_into_dir() raises ValueError for invalid paths."""
-        with base_repo as repo:
-            with pytest.raises(DBPathOutsideTargetError):
-                repo.insert_dir(repo.db.root.parent)
+        with pytest.raises(DBPathOutsideTargetError):
+            base_repo.insert_dir(base_repo.db.root.parent)
 
     def testInsertDirAncestorValues(self, base_repo):
         """DirRepo.insert_dir_ancestor() inserts correct records."""
-        with base_repo as repo:
-            expect = [(1, 0, 1), (2, 1, 2), (3, 0, 1)]
-            repo.insert_dir_ancestor(expect)
-            with repo.db.connect() as conn:
-                rows = conn.execute("SELECT * FROM dir_ancestor").fetchall()
-            assert rows == expect
+        expect = [(1, 0, 1), (2, 1, 2), (3, 0, 1)]
+        base_repo.insert_dir_ancestor(expect)
+        with base_repo.db.connect() as conn:
+            rows = conn.execute("SELECT * FROM dir_ancestor").fetchall()
+        assert rows == expect
 
     def testInsertDirAncestorDupes(self, base_repo):
         """DirRepo.insert_dir_ancestor() doesn't add duplicate rows to dir_ancestor"""
         dupe_row = (1, 1, 1)
-        with base_repo as repo:
-            repo.insert_dir_ancestor([dupe_row, dupe_row, dupe_row])
-            with repo.db.connect() as conn:
-                rows = conn.execute("SELECT * FROM dir_ancestor").fetchall()
-            assert len(rows) == 1
-            assert rows[0] == dupe_row
+        base_repo.insert_dir_ancestor([dupe_row, dupe_row, dupe_row])
+        with base_repo.db.connect() as conn:
+            rows = conn.execute("SELECT * FROM dir_ancestor").fetchall()
+        assert len(rows) == 1
+        assert rows[0] == dupe_row
 
 
 class TestAdd:
     def testNoAncestorDirs(self, base_repo):
         """DirRepo.add() adds a directory without ancestors correctly."""
-        with base_repo as repo:
-            # Dir a @ root level
-            dir = Dir(path=repo.db.root / "a")
-            repo.add(dir)
-            assert dir.id == 1
-            with repo.db.connect() as conn:
-                rows = conn.execute("SELECT * FROM dir").fetchall()
-                assert len(rows) == 1
-                assert rows[0] == (1, "a")
-                rows = conn.execute("SELECT * FROM dir_ancestor").fetchall()
-                assert len(rows) == 1
-                assert rows[0] == (1, 1, 0)
-            # Dir b @ root level
-            dir = Dir(path="b")
-            repo.add(dir)
-            assert dir.id == 2
-            with repo.db.connect() as conn:
-                rows = conn.execute("SELECT * FROM dir").fetchall()
-                assert len(rows) == 2
-                assert rows[1] == (2, "b")
-                rows = conn.execute("SELECT * FROM dir_ancestor").fetchall()
-                assert len(rows) == 2
-                assert rows[1] == (2, 2, 0)
+        # Dir a @ root level
+        dir = Dir(path=base_repo.db.root / "a")
+        base_repo.add(dir)
+        assert dir.id == 1
+        assert read_tree_rows(base_repo.db) == ([(1, "a")], [(1, 1, 0)])
+        # Dir b @ root level
+        dir = Dir(path="b")
+        base_repo.add(dir)
+        assert dir.id == 2
+        d_rows, da_rows = read_tree_rows(base_repo.db)
+        assert d_rows == [(1, "a"), (2, "b")]
+        assert da_rows == [(1, 1, 0), (2, 2, 0)]
+
+    def testManyTestTree(self, base_repo):
+        """DirRepo.add_many() builds exactly the rows test_repo is seeded with."""
+        base_repo.add_many([Dir(path=path) for path in TREE_PATHS])
+        d_rows, da_rows = read_tree_rows(base_repo.db)
+        assert set(d_rows) == EXPECT_TREE_DIRS
+        assert set(da_rows) == EXPECT_TREE_DIR_ANCS
+
+    def testManySameAsAdd(self, test_repo):
+        """DirRepo.add_many() writes the same rows & ids as repeated add() calls."""
+        new = ["a/b/x", "y", "a/b/c", "y/z"]
+        added = test_repo.add_many([Dir(path=path) for path in new])
+        expect_rows = read_tree_rows(test_repo.db)
+        repo = DirRepo(DBConnector(MEMORY_PATH, test_repo.db.root))
+        for path in TREE_PATHS:
+            repo.add(Dir(path=path))
+        dirs = [Dir(path=path) for path in new]
+        expect_added = [repo.add(dir) for dir in dirs]
+        assert [dir.id for dir in dirs] == [9, 10, 3, 11]
+        assert read_tree_rows(repo.db) == expect_rows
+        repo.db.close()
+        # Compare relative to each repo's own root
+        for got, exp in zip(added, expect_added):
+            assert [d.id for d in got] == [d.id for d in exp]
+            assert [d.path.name for d in got] == [d.path.name for d in exp]
 
     def testDeepNesting(self, base_repo):
         """
@@ -420,69 +563,66 @@ class TestAdd:
             - dir_ancestor table has all the expected foreign keys
             - dir_ancestor records are in right order
         """
-        with base_repo as repo:
-            root = repo.db.root
-            # First arrange expected returned Dir list
-            dira = Dir(path=root / "a", id=1)
-            dirb = Dir(path=root / "a/b", id=2)
-            dirc = Dir(path=root / "a/b/c", id=3)
-            dird = Dir(path=root / "a/b/c/d", id=4)
-            dirs = [dira, dirb, dirc, dird]
-
-            # Act on the repo with add
-            real_dirs = repo.add(Dir(path=(root / "a/b/c/d")))
-
-            # Assert that the returned list is as expected
-            assert real_dirs == dirs, f"Expected Dir list: {dirs}, got {real_dirs}"
-            # Assert the dir & dir_ancestor tables are as expected
-            d_rows = [(1, "a"), (2, "a/b"), (3, "a/b/c"), (4, "a/b/c/d")]
-            da_rows = [(1, 1, 0)]
-            da_rows += [(2, 2, 0), (2, 1, 1)]
-            da_rows += [(3, 3, 0), (3, 2, 1), (3, 1, 2)]
-            da_rows += [(4, 4, 0), (4, 3, 1), (4, 2, 2), (4, 1, 3)]
-            with repo.db.connect() as conn:
-                real_drows = conn.execute("SELECT * FROM dir").fetchall()
-                real_da_rows = conn.execute("SELECT * FROM dir_ancestor").fetchall()
-            assert real_drows == d_rows
-            assert real_da_rows == da_rows
+        root = base_repo.db.root
+        # First arrange expected returned Dir list
+        dira = Dir(path=root / "a", id=1)
+        dirb = Dir(path=root / "a/b", id=2)
+        dirc = Dir(path=root / "a/b/c", id=3)
+        dird = Dir(path=root / "a/b/c/d", id=4)
+        dirs = [dira, dirb, dirc, dird]
+
+        # Act on the repo with add
+        real_dirs = base_repo.add(Dir(path=(root / "a/b/c/d")))
+
+        # Assert that the returned list is as expected
+        assert real_dirs == dirs, f"Expected Dir list: {dirs}, got {real_dirs}"
+        # Assert the dir & dir_ancestor tables are as expected
+        d_rows = [(1, "a"), (2, "a/b"), (3, "a/b/c"), (4, "a/b/c/d")]
+        da_rows = [(1, 1, 0)]
+        da_rows += [(2, 2, 0), (2, 1, 1)]
+        da_rows += [(3, 3, 0), (3, 2, 1), (3, 1, 2)]
+        da_rows += [(4, 4, 0), (4, 3, 1), (4, 2, 2), (4, 1, 3)]
+        assert read_tree_rows(base_repo.db) == (d_rows, da_rows)
 
 
 class TestSelectUtils:
     """Test SELECT query utility methods"""
 
     @pytest.mark.parametrize("path,expect", [("f", 6), ("a/b/c", 3), ("f/g", 7)])
-    def testDirWherePath(self, test_repo, path, expect):
+    def testDirWherePath(self, seeded_repo, path, expect):
         """Test that select_dir_where_path returns expected id for given path."""
-        with test_repo as repo:
-            assert repo.select_dir_where_path(path)[0] == expect
+        assert seeded_repo.select_dir_where_path(path)[0] == expect
 
     def testDirWherePathNoExist(self, base_repo):
         """Test that select_dir_where_path returns None for paths that dont exist in dir."""
         # Base repo has no dir records so anything we select shouldnt exist
-        with base_repo as repo:
-            assert repo.select_dir_where_path("foobar") is None
-            repo.add(Dir(path="foobaz"))
-            assert repo.select_dir_where_path("foobar") is None
+        assert base_repo.select_dir_where_path("foobar") is None
+        base_repo.add(Dir(path="foobaz"))
+        assert base_repo.select_dir_where_path("foobar") is None
+
+    def testDirWherePathQuoted(self, base_repo):
+        """Paths are bound as parameters so quotes in them need no escaping."""
+        base_repo.add(Dir(path='it\'s/a "dir"'))
+        assert base_repo.select_dir_where_path("it's") == (1, "it's")
+        assert base_repo.select_dir_where_path('it\'s/a "dir"') == (2, 'it\'s/a "dir"')
 
     @pytest.mark.parametrize("id,expect", [(6, "f"), (3, "a/b/c"), (7, "f/g")])
-    def testDirWhereId(self, test_repo, id, expect):
+    def testDirWhereId(self, seeded_repo, id, expect):
         """DirRepo.select_dir_where_id() returns correct row from dir"""
-        with test_repo as repo:
-            assert repo.select_dir_where_id(id)[0] == id
-            assert repo.select_dir_where_id(id)[1] == expect
+        assert seeded_repo.select_dir_where_id(id)[0] == id
+        assert seeded_repo.select_dir_where_id(id)[1] == expect
 
     def testDirWhereIdNoExist(self, base_repo):
         """DirRepo.select_dir_where_id returns None on non-existing ids in dir."""
-        with base_repo as repo:
-            assert repo.select_dir_where_id(42) is None
-            repo.add(Dir(path="foobar/blah/foobaz"))
-            assert repo.select_dir_where_id(4) is None
+        assert base_repo.select_dir_where_id(42) is None
+        base_repo.add(Dir(path="foobar/blah/foobaz"))
+        assert base_repo.select_dir_where_id(4) is None
 
 
 class TestSelectAncestor:
     """DirRepo.select_ancestors_where_{path,id} method tests"""
 
-    def testWherePath(self, test_repo):
+    def testWherePath(self, seeded_repo):
         """
         Test DirRepo.select_dirs_where_ancestor() with different paths and depths.
 
@@ -494,15 +634,14 @@ class TestSelectAncestor:
         - Empty result for top-level directory 'f'.
         - Consistency between absolute and relative paths.
         """
-        with test_repo as repo:
-            fn = repo.select_ancestors_where_path
-            assert same_rows(fn("a/b/c"), [(2,), (1,)])
-            assert same_rows(fn("a/b/c", depth=99), [(2,), (1,)])
-            assert same_rows(fn("a/b/c", depth=1), [(2,)])
-            assert same_rows(fn("f/g"), [(6,)])
-            assert same_rows(fn("f"), [])
-
-    def testWhereId(self, test_repo):
+        fn = seeded_repo.select_ancestors_where_path
+        assert same_rows(fn("a/b/c"), [(2,), (1,)])
+        assert same_rows(fn("a/b/c", depth=99), [(2,), (1,)])
+        assert same_rows(fn("a/b/c", depth=1), [(2,)])
+        assert same_rows(fn("f/g"), [(6,)])
+        assert same_rows(fn("f"), [])
+
+    def testWhereId(self, seeded_repo):
         """
         Test DirRepo.select_dirs_where_ancestor() with different IDs and depths.
 
@@ -513,19 +652,26 @@ class TestSelectAncestor:
         - Ancestor row for ID 7.
         - Empty result for top-level directory with ID 6.
         """
-        with test_repo as repo:
-            fn = repo.select_ancestors_where_id
-            assert same_rows(fn(3), [(2,), (1,)])
-            assert same_rows(fn(3, depth=99), [(2,), (1,)])
-            assert same_rows(fn(3, depth=1), [(2,)])
-            assert same_rows(fn(7), [(6,)])
-            assert same_rows(fn(6), [])
+        fn = seeded_repo.select_ancestors_where_id
+        assert same_rows(fn(3), [(2,), (1,)])
+        assert same_rows(fn(3, depth=99), [(2,), (1,)])
+        assert same_rows(fn(3, depth=1), [(2,)])
+        assert same_rows(fn(7), [(6,)])
+        assert same_rows(fn(6), [])
+
+    def testWhereIds(self, seeded_repo):
+        """Batched lookup returns the same rows as one query per id."""
+        ids = [3, 4, 6, 42]
+        res = seeded_repo.select_ancestors_where_ids(ids, depth=1)
+        assert res == {id: seeded_repo.select_ancestors_where_id(id, 1) for id in ids}
+        assert res[3] == [(2, "a/b")]
+        assert seeded_repo.select_ancestors_where_ids([]) == {}
 
 
 class TestSelectDescendants:
     """DirRepo.select_descendants_where_{path,id} method tests"""
 
-    def testWherePath(self, test_repo):
+    def testWherePath(self, seeded_repo):
         """
         Test DirRepo.select_descendants_where_path() with different paths and depths.
 
@@ -538,17 +684,16 @@ class TestSelectDescendants:
         - Empty result for leaf directory 'a/b/c'.
         - Empty result for another leaf directory 'a/d'.
         """
-        with test_repo as repo:
-            fn = repo.select_descendants_where_path
-            assert same_rows(fn("a/b"), [(3,)])
-            assert same_rows(fn("a"), [(2,), (4,), (5,), (3,)])
-            assert same_rows(fn("a", depth=99), [(2,), (4,), (5,), (3,)])
-            assert same_rows(fn("a", depth=1), [(2,), (4,), (5,)])
-            assert same_rows(fn("f"), [(7,), (8,)])
-            assert same_rows(fn("a/b/c"), [])
-            assert same_rows(fn("a/d"), [])
-
-    def testWhereId(self, test_repo):
+        fn = seeded_repo.select_descendants_where_path
+        assert same_rows(fn("a/b"), [(3,)])
+        assert same_rows(fn("a"), [(2,), (4,), (5,), (3,)])
+        assert same_rows(fn("a", depth=99), [(2,), (4,), (5,), (3,)])
+        assert same_rows(fn("a", depth=1), [(2,), (4,), (5,)])
+        assert same_rows(fn("f"), [(7,), (8,)])
+        assert same_rows(fn("a/b/c"), [])
+        assert same_rows(fn("a/d"), [])
+
+    def testWhereId(self, seeded_repo):
         """
         Test DirRepo.select_descendants_where_id() with different IDs and depths.
 
@@ -559,172 +704,344 @@ class TestSelectDescendants:
         - Descendant rows for ID 1 with depth=1.
         - Empty result for leaf directory with ID 4.
         """
-        with test_repo as repo:
-            fn = repo.select_descendants_where_id
-            assert same_rows(fn(2), [(3,)])
-            assert same_rows(fn(1), [(2,), (4,), (5,), (3,)])
-            assert same_rows(fn(1, depth=99), [(2,), (4,), (5,), (3,)])
-            assert same_rows(fn(1, depth=1), [(2,), (4,), (5,)])
-            assert same_rows(fn(4), [])
+        fn = seeded_repo.select_descendants_where_id
+        assert same_rows(fn(2), [(3,)])
+        assert same_rows(fn(1), [(2,), (4,), (5,), (3,)])
+        assert same_rows(fn(1, depth=99), [(2,), (4,), (5,), (3,)])
+        assert same_rows(fn(1, depth=1), [(2,), (4,), (5,)])
+        assert same_rows(fn(4), [])
+
+    def testWhereIds(self, seeded_repo):
+        """
+        Test DirRepo.select_descendants_where_ids() returns the same rows as
+        select_descendants_where_id() for every given ID in one query.
+        """
+        ids = [1, 2, 4, 6, 42]
+        for depth in (None, 1, 99):
+            res = seeded_repo.select_descendants_where_ids(ids, depth=depth)
+            assert list(res) == ids
+            for id in ids:
+                assert res[id] == seeded_repo.select_descendants_where_id(id, depth)
+        assert seeded_repo.select_descendants_where_ids([]) == {}
+
+    def testWhereIdsPastVariableLimit(self, seeded_repo):
+        """Ids go in as one bound JSON array, so any count of them fits one query"""
+        ids = range(1, 40_000)  # More than SQLite's default 32766 bound variables
+        res = seeded_repo.select_descendants_where_ids(ids, depth=1)
+        assert len(res) == len(ids)
+        assert res[6] == [(7, "f/g"), (8, "f/h")]
+        assert res[39_998] == []
+
+
+class TestResolveLookup:
+    """DirRepo.resolve_lookup() argument priority tests"""
+
+    @pytest.mark.parametrize(
+        "args,expect",
+        [
+            ({"id": 1, "path": "a/b", "dir": Dir(id=6, path="f")}, (1, None)),
+            ({"path": "a/b", "dir": Dir(id=6, path="f")}, (None, "a/b")),
+            ({"dir": Dir(id=6, path="f")}, (6, PP("f"))),
+            ({"dir": Dir(path="f")}, (None, PP("f"))),
+        ],
+    )
+    def testPriority(self, args, expect):
+        """Resolves id > path > dir and takes both members from a dir."""
+        assert DirRepo.resolve_lookup(**args) == expect
+
+    def testRaises(self):
+        """Raises ValueError when no args are given."""
+        with pytest.raises(ValueError):
+            DirRepo.resolve_lookup()
 
 
 class TestGetOne:
-    def testPrefersId(self, test_repo):
-        """Prioritizes id over all other args."""
-        with test_repo as repo:
-            dir = repo.getone(id=1, path="a/b/c", dir=Dir(id=6, path="f/h"))
-            assert dir == Dir(id=1, path=repo.db.root / "a")
-
-    def testPrefersPath(self, test_repo):
-        """Prioritizes path arg over all others when id is None."""
-        with test_repo as repo:
-            dir = repo.getone(path="a/b/c", dir=Dir(id=6, path="f/h"))
-            assert dir == Dir(id=3, path=repo.db.root / "a/b/c")
-
-    def testPrefersDirId(self, test_repo):
-        """Prioritizes dir arg's id over its path member when id & path are None."""
-        with test_repo as repo:
-            dir = repo.getone(dir=Dir(id=6, path="f/h"))
-            assert dir == Dir(id=6, path=repo.db.root / "f")
-
-    def testPrefersDirPath(self, test_repo):
-        """Prioritizes dir arg's path only when all other args are None."""
-        with test_repo as repo:
-            dir = repo.getone(dir=Dir(path="f/h"))
-            assert dir == Dir(id=8, path=repo.db.root / "f/h")
+    @pytest.mark.parametrize(
+        "kwargs,expect", list(zip(LOOKUPS, "acfh")), ids=LOOKUP_IDS
+    )
+    def testPrefers(self, seeded_repo, kwargs, expect):
+        """Prioritizes id, then path, then dir arg's id, then dir arg's path."""
+        expect_dir = getattr(dirs_for(seeded_repo.db.root), expect)
+        assert seeded_repo.getone(**kwargs) == expect_dir
 
     def testRaises(self, base_repo):
         """Raises ValueError when no args and
         DBPathOutsideTargetError when path outside repo are given."""
-        with base_repo as repo:
-            with pytest.raises(ValueError):
-                repo.getone()
-            with pytest.raises(DBPathOutsideTargetError):
-                repo.getone(path="/not/in/repo")
+        with pytest.raises(ValueError):
+            base_repo.getone()
+        with pytest.raises(DBPathOutsideTargetError):
+            base_repo.getone(path="/not/in/repo")
 
-    def testDirNotFound(self, test_repo):
+    def testDirNotFound(self, seeded_repo):
         """Returns None when no dir is found."""
-        with test_repo as repo:
-            assert repo.getone(path="noexist") is None
-            assert repo.getone(id=42) is None
+        assert seeded_repo.getone(path="noexist") is None
+        assert seeded_repo.getone(id=42) is None
 
-    def testRelAndAbsPathSame(self, test_repo):
+    def testRelAndAbsPathSame(self, seeded_repo):
         """Returns same result for relative and absolute paths."""
-        with test_repo as repo:
-            root = repo.db.root
-            assert repo.getone(path=root / "a/b/c") == repo.getone(path="a/b/c")
-            assert repo.getone(path=root / "f/g") == repo.getone(path="f/g")
+        root, fn = seeded_repo.db.root, seeded_repo.getone
+        assert fn(path=root / "a/b/c") == fn(path="a/b/c")
+        assert fn(path=root / "f/g") == fn(path="f/g")
+
+    def testTopLevelCached(self, test_repo):
+        """Serves top-level dirs without a query until a new one is inserted."""
+        expect = dirs_for(test_repo.db.root)
+        assert test_repo.top_level_dirs() == {1: "a", 6: "f"}
+        with (
+            patch.object(test_repo, "select_dir_where_id") as mock_id,
+            patch.object(test_repo, "select_dir_where_path") as mock_path,
+        ):
+            assert test_repo.getone(id=1) == expect.a
+            assert test_repo.getone(path="f") == expect.f
+            assert test_repo.get_ancestors(path="a") == []
+            mock_id.assert_not_called()
+            mock_path.assert_not_called()
+        test_repo.insert_dir("x/y")
+        assert test_repo.top_level_dirs() == {1: "a", 6: "f"}
+        test_repo.insert_dir("x")
+        assert test_repo.top_level_dirs() == {1: "a", 6: "f", 10: "x"}
 
 
 class TestGetAncestors:
     """DirRepo.get_ancestors() method tests"""
 
-    def testPrefersId(self, test_repo):
-        """Prioritizes id over all other args."""
-        with test_repo as repo:
-            dir = repo.get_ancestors(id=1, path="a/b/c", dir=Dir(id=6, path="f/h"))
-            assert dir == []
-
-    def testPrefersPath(self, test_repo):
-        """Prioritizes path arg over all others when id is None."""
-        with test_repo as repo:
-            expect = Dirs(repo.db.root)
-            dir = repo.get_ancestors(path="a/b/c", dir=Dir(id=6, path="f/h"))
-            assert dir == [expect.b, expect.a]
-
-    def testPrefersDirId(self, test_repo):
-        """Prioritizes dir arg's id over its path member when id & path are None."""
-        with test_repo as repo:
-            dir = repo.get_ancestors(dir=Dir(id=6, path="f/h"))
-            assert dir == []
-
-    def testPrefersDirPath(self, test_repo):
-        """Prioritizes dir arg's path only when all other args are None."""
-        with test_repo as repo:
-            dir = repo.get_ancestors(dir=Dir(path="f/h"))
-            expect = Dirs(repo.db.root)
-            assert dir == [expect.f]
+    @pytest.mark.parametrize(
+        "kwargs,expect", list(zip(LOOKUPS, ["", "ba", "", "f"])), ids=LOOKUP_IDS
+    )
+    def testPrefers(self, seeded_repo, kwargs, expect):
+        """Prioritizes id, then path, then dir arg's id, then dir arg's path."""
+        expect_dirs = dirs_for(seeded_repo.db.root)
+        expect = [getattr(expect_dirs, name) for name in expect]
+        assert seeded_repo.get_ancestors(**kwargs) == expect
 
     def testRaises(self, base_repo):
         """Raises ValueError when no args and
         DBPathOutsideTargetError when path outside repo are given."""
-        with base_repo as repo:
-            with pytest.raises(ValueError):
-                repo.get_ancestors()
-            with pytest.raises(DBPathOutsideTargetError):
-                repo.get_ancestors(path="/not/in/repo")
+        with pytest.raises(ValueError):
+            base_repo.get_ancestors()
+        with pytest.raises(DBPathOutsideTargetError):
+            base_repo.get_ancestors(path="/not/in/repo")
 
-    def testAbsAndRelPathsEqual(self, test_repo):
+    def testAbsAndRelPathsEqual(self, seeded_repo):
         """Returns same result for relative and absolute paths."""
-        with test_repo as repo:
-            expect = Dirs(repo.db.root)
-            ancestors = repo.get_ancestors(path="a/b/c")
-            assert ancestors == [expect.b, expect.a]
-            ancestors = repo.get_ancestors(path="f/g")
-            assert ancestors == [expect.f]
-
-    def testDepthWorks(self, test_repo):
+        expect = dirs_for(seeded_repo.db.root)
+        ancestors = seeded_repo.get_ancestors(path="a/b/c")
+        assert ancestors == [expect.b, expect.a]
+        ancestors = seeded_repo.get_ancestors(path="f/g")
+        assert ancestors == [expect.f]
+
+    def testDepthWorks(self, seeded_repo):
         """Returns correct descendants with depth limit."""
-        with test_repo as repo:
-            expect = Dirs(repo.db.root)
-            dir = repo.get_ancestors(path="a/b/c", depth=1)
-            assert dir == [expect.b]
-            dir = repo.get_descendants(path="f", depth=0)
-            assert dir == []
+        expect = dirs_for(seeded_repo.db.root)
+        dir = seeded_repo.get_ancestors(path="a/b/c", depth=1)
+        assert dir == [expect.b]
+        dir = seeded_repo.get_descendants(path="f", depth=0)
+        assert dir == []
+
+    def testMemoized(self, test_repo):
+        """Repeated lookups for the same (id|path, depth) only query once."""
+        with (
+            test_repo.cached(),
+            patch.object(
+                test_repo,
+                "select_ancestors_where_id",
+                wraps=test_repo.select_ancestors_where_id,
+            ) as spy_id,
+            patch.object(
+                test_repo,
+                "select_ancestors_where_path",
+                wraps=test_repo.select_ancestors_where_path,
+            ) as spy_path,
+        ):
+            first = test_repo.get_ancestors(id=3)
+            assert test_repo.get_ancestors(id=3) == first
+            assert test_repo.get_ancestors(dir=Dir(id=3, path="a/b/c")) == first
+            assert test_repo.get_ancestors(path="a/b/c") == first
+            assert test_repo.get_ancestors(path=test_repo.db.root / "a/b/c") == first
+            assert spy_id.call_count == 1
+            assert spy_path.call_count == 1
+            test_repo.get_ancestors(id=3, depth=1)
+            assert spy_id.call_count == 2
+
+    def testDepthNone(self, seeded_repo):
+        """A None depth searches the maximum depth."""
+        expect = dirs_for(seeded_repo.db.root)
+        assert seeded_repo.get_ancestors(path="a/b/c", depth=None) == [
+            expect.b,
+            expect.a,
+        ]
+        assert seeded_repo.get_ancestors(id=7, depth=None) == [expect.f]
+
+    def testMissingAncestorDirs(self, test_repo):
+        """Dirs inserted without their parents have no ancestors."""
+        test_repo.insert_dir("x/y/z")
+        assert test_repo.get_ancestors(path="x/y/z") == []
+
+    def testMissingClosureRows(self, test_repo):
+        """Follows the dir_ancestor table, not the path prefixes of a dir."""
+        p_id, q_id = test_repo.insert_dirs(["p", "p/q"])
+        assert test_repo.get_ancestors(path="p/q") == []
+        assert test_repo.get_ancestors(id=q_id) == []
+        assert test_repo.select_ancestors_where_id(q_id) == []
+
+    def testMany(self, test_repo):
+        """Fetches ancestors of many ids in one query and memoizes them."""
+        expect = dirs_for(test_repo.db.root)
+        with test_repo.cached():
+            with patch.object(
+                test_repo,
+                "select_ancestors_where_ids",
+                wraps=test_repo.select_ancestors_where_ids,
+            ) as spy:
+                res = test_repo.get_ancestors_many([3, 7, 1])
+                assert res == {3: [expect.b, expect.a], 7: [expect.f], 1: []}
+                assert spy.call_count == 1
+            with patch.object(test_repo, "select_ancestors_where_id") as mock_id:
+                assert test_repo.get_ancestors(id=3) == [expect.b, expect.a]
+                mock_id.assert_not_called()
+
+    def testInsertInvalidates(self, test_repo):
+        """Adding dirs clears memoized results so new ancestors show up."""
+        expect = dirs_for(test_repo.db.root)
+        with test_repo.cached():
+            assert test_repo.get_ancestors(path="x/y") == []
+            test_repo.add(Dir(path="x/y"))
+            assert test_repo.get_ancestors(path="x/y") == [
+                Dir(id=9, path=test_repo.db.root / "x")
+            ]
+            # Mutating a returned Dir doesn't leak into the memo
+            test_repo.get_ancestors(id=3)[0].id = 42
+            assert test_repo.get_ancestors(id=3) == [expect.b, expect.a]
+
+    def testMemoOnlyInCachedBlock(self, test_repo):
+        """Outside cached() lookups see writes made through other DirRepos."""
+        assert test_repo.get_ancestors(path="x/y") == []
+        DirRepo(test_repo.db).add(Dir(path="x/y"))
+        assert test_repo.get_ancestors(path="x/y") == [
+            Dir(id=9, path=test_repo.db.root / "x")
+        ]
+        with test_repo.cached():
+            test_repo.get_ancestors(id=3)
+            with test_repo.cached():  # Nested blocks share the outer memo
+                assert (3, DEFAULT_DEPTH) in test_repo._anc_cache
+            assert (3, DEFAULT_DEPTH) in test_repo._anc_cache
+        assert test_repo._anc_cache == {}
 
 
 class TestGetDescendants:
     """DirRepo.get_descendants() method tests"""
 
-    def testPrefersId(self, test_repo):
-        """Prioritizes id over all other args and returns test_repo dirs in order."""
-        with test_repo as repo:
-            dir = repo.get_descendants(id=1, path="a/b/c", dir=Dir(id=6, path="f/h"))
-            expect = Dirs(repo.db.root)
-            assert dir == [expect.b, expect.d, expect.e, expect.c]
-
-    def testPrefersPath(self, test_repo):
-        """Prioritizes path arg over all others when id is None and returns expected empty list."""
-        with test_repo as repo:
-            dir = repo.get_descendants(path="a/b/c", dir=Dir(id=6, path="f/h"))
-            assert dir == []
-
-    def testPrefersDirId(self, test_repo):
-        """Prioritizes dir arg's id over its path member when id & path are None."""
-        with test_repo as repo:
-            dir = repo.get_descendants(dir=Dir(id=6, path="f/h"))
-            expect = Dirs(repo.db.root)
-            assert dir == [expect.g, expect.h]
-
-    def testPrefersDirPath(self, test_repo):
-        """Prioritizes dir arg's path only when all other args are None."""
-        with test_repo as repo:
-            dir = repo.get_descendants(dir=Dir(path="f/h"))
-            assert dir == []
+    @pytest.mark.parametrize(
+        "kwargs,expect", list(zip(LOOKUPS, ["bdec", "", "gh", ""])), ids=LOOKUP_IDS
+    )
+    def testPrefers(self, seeded_repo, kwargs, expect):
+        """
+        Prioritizes id, then path, then dir arg's id, then dir arg's path.
+        Descendants come in depth then id order.
+        """
+        expect_dirs = dirs_for(seeded_repo.db.root)
+        expect = [getattr(expect_dirs, name) for name in expect]
+        assert seeded_repo.get_descendants(**kwargs) == expect
 
     def testRaises(self, base_repo):
         """Raises ValueError when no args and
         DBPathOutsideTargetError when path outside repo are given."""
-        with base_repo as repo:
-            with pytest.raises(ValueError):
-                repo.get_descendants()
-            with pytest.raises(DBPathOutsideTargetError):
-                repo.get_descendants(path="/not/in/repo")
+        with pytest.raises(ValueError):
+            base_repo.get_descendants()
+        with pytest.raises(DBPathOutsideTargetError):
+            base_repo.get_descendants(path="/not/in/repo")
 
-    def testAbsAndRelPathsEqual(self, test_repo):
+    def testAbsAndRelPathsEqual(self, seeded_repo):
         """Returns same result for relative and absolute paths."""
-        with test_repo as repo:
-            expect = Dirs(repo.db.root)
-            ancestors = repo.get_descendants(path="a")
-            assert ancestors == [expect.b, expect.d, expect.e, expect.c]
-            ancestors = repo.get_descendants(path="f")
-            assert ancestors == [expect.g, expect.h]
-
-    def testDepthWorks(self, test_repo):
+        expect = dirs_for(seeded_repo.db.root)
+        ancestors = seeded_repo.get_descendants(path="a")
+        assert ancestors == [expect.b, expect.d, expect.e, expect.c]
+        ancestors = seeded_repo.get_descendants(path="f")
+        assert ancestors == [expect.g, expect.h]
+
+    def testDepthWorks(self, seeded_repo):
         """Returns correct descendants with depth limit."""
-        with test_repo as repo:
-            expect = Dirs(repo.db.root)
-            dir = repo.get_descendants(path="a", depth=1)
-            assert dir == [expect.b, expect.d, expect.e]
-            dir = repo.get_descendants(path="f", depth=0)
-            assert dir == []
+        expect = dirs_for(seeded_repo.db.root)
+        dir = seeded_repo.get_descendants(path="a", depth=1)
+        assert dir == [expect.b, expect.d, expect.e]
+        dir = seeded_repo.get_descendants(path="f", depth=0)
+        assert dir == []
+
+    def testIterLazy(self, seeded_repo):
+        """iter_descendants yields the same dirs lazily and raises eagerly."""
+        expect = dirs_for(seeded_repo.db.root)
+        descendants = seeded_repo.get_descendants(path="a")
+        assert list(seeded_repo.iter_descendants(path="a")) == descendants
+        with patch.object(
+            seeded_repo.db, "denormalize_path", wraps=seeded_repo.db.denormalize_path
+        ) as spy:
+            dirs = seeded_repo.iter_descendants(id=1)
+            assert next(dirs) == expect.b
+            assert spy.call_count == 1
+        assert list(seeded_repo.iter_descendants(path="noexist")) == []
+        with pytest.raises(ValueError):
+            seeded_repo.iter_descendants()
+
+    def testIterEarlyExit(self, seeded_repo):
+        """Stopping early only builds the Dirs iterated to, from a single query."""
+        expect = dirs_for(seeded_repo.db.root)
+        with (
+            patch.object(
+                seeded_repo,
+                "select_descendants_where_id",
+                wraps=seeded_repo.select_descendants_where_id,
+            ) as spy_query,
+            patch("lib.handler.dir_repo.Dir", wraps=Dir) as spy_dir,
+        ):
+            dirs = seeded_repo.iter_descendants(id=1)
+            assert list(islice(dirs, 2)) == [expect.b, expect.d]
+            dirs.close()
+            assert spy_query.call_count == 1
+            assert spy_dir.call_count == 2
+
+    def testMemoized(self, test_repo):
+        """Repeated lookups in a cached() block for the same key only query once."""
+        expect = dirs_for(test_repo.db.root)
+        with (
+            test_repo.cached(),
+            patch.object(
+                test_repo,
+                "select_descendants_where_id",
+                wraps=test_repo.select_descendants_where_id,
+            ) as spy_id,
+            patch.object(
+                test_repo,
+                "select_descendants_where_path",
+                wraps=test_repo.select_descendants_where_path,
+            ) as spy_path,
+        ):
+            assert test_repo.get_descendants(id=6) == [expect.g, expect.h]
+            assert test_repo.get_descendants(id=6) == [expect.g, expect.h]
+            assert test_repo.get_descendants(path="a/b") == [expect.c]
+            assert test_repo.get_descendants(path="a/b") == [expect.c]
+            assert spy_id.call_count == 1
+            assert spy_path.call_count == 1
+            test_repo.get_descendants(id=6, depth=1)
+            assert spy_id.call_count == 2
+
+    def testInsertInvalidates(self, test_repo):
+        """Adding dirs clears memoized results so new descendants show up."""
+        expect = dirs_for(test_repo.db.root)
+        with test_repo.cached():
+            assert test_repo.get_descendants(path="f/g") == []
+            test_repo.add(Dir(path="f/g/i"))
+            new = Dir(id=9, path=test_repo.db.root / "f/g/i")
+            assert test_repo.get_descendants(path="f/g") == [new]
+            assert test_repo.get_descendants(id=6) == [expect.g, expect.h, new]
+
+    def testMemoOnlyInCachedBlock(self, test_repo):
+        """Outside cached() lookups see writes made through other DirRepos."""
+        assert test_repo.get_descendants(path="m") == []
+        DirRepo(test_repo.db).add(Dir(path="m/n"))
+        assert test_repo.get_descendants(path="m") == [
+            Dir(id=10, path=test_repo.db.root / "m/n")
+        ]
+        with test_repo.cached():
+            test_repo.get_descendants(id=1)
+            assert (1, DEFAULT_DEPTH) in test_repo._desc_cache
+        assert test_repo._desc_cache == {}
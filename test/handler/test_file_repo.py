@@ -1,15 +1,11 @@
-# TODO: updated column can be off by 1 second, make tests resilient to this
-from contextlib import contextmanager
 from datetime import datetime as dt
-from datetime import timedelta as td
 import os
 from pathlib import PurePath as PP
 import pytest
 import sqlite3 as sql
-import tempfile
 from unittest.mock import patch
 
-from lib.handler.db_connector import DBConnector as DBC
+from lib.handler.db_connector import DBConnector as DBC, MEMORY_PATH
 from lib.handler.file_repo import FileRepo
 from lib.handler.dir_repo import DirRepo
 from lib.model.file import File
@@ -18,69 +14,108 @@ from lib.model.hash import HashMD5
 
 MOD_DBC = "lib.handler.db_connector.DBConnector"
 MOD_FR = "lib.handler.file_repo.FileRepo"
+# Epoch time frozen_now pins FileRepo's clock to
+FROZEN_NOW = 1_700_000_000
+# Files shared by the get tests, built once since FileRepo.add doesn't mutate them
+# Files a to h, each also with mtimes 100 to 800 in the same order
+TIMES = (100, 200, 300, 400, 500, 600, 700, 800)
+FILES_AH = tuple(File(n) for n in "abcdefgh")
+FILES_AH_MTIME = tuple(
+    File(n, mtime=dt.fromtimestamp(t)) for n, t in zip("abcdefgh", TIMES)
+)
+# Files named after their md5 hex, plus one without an md5
+MD5S = ("deadbeef", "cafefeed", "00", "12345678")
+FILES_MD5 = tuple(File(m, md5=HashMD5(hex=m)) for m in MD5S) + (File("none"),)
+# Number of files testBulkAddThenGet adds to one dir
+BULK_SIZE = 10_000
 
 
 ### Fixtures ###
 # TODO: Move common fixtures to conftest.py
-@contextmanager
-def temp_dir_context():
-    with tempfile.TemporaryDirectory() as tempdir:
-        yield PP(tempdir)
+@pytest.fixture
+def base_dbconn(tmp_path):
+    """In-memory db rooted at a tempdir, every connect reuses its one connection."""
+    db = DBC(MEMORY_PATH, PP(tmp_path))
+    yield db
+    db.close()
+
+
+@pytest.fixture(scope="session")
+def base_repo_template(tmp_path_factory):
+    """In-memory db with the dir & file tables created once per session."""
+    db = DBC(MEMORY_PATH, PP(tmp_path_factory.mktemp("scout")))
+    DirRepo(db)
+    FileRepo(db)
+    yield db
+    db.close()
 
 
 @pytest.fixture
-@contextmanager
-def base_dbconn():
-    with temp_dir_context() as tempdir:
-        db = DBC(tempdir / ".scout.db")
-        yield db
+def base_repo(base_repo_template, clone_db):
+    """FileRepo & DirRepo on a fresh copy of base_repo_template."""
+    db = clone_db(base_repo_template)
+    yield FileRepo(db), DirRepo(db)
+    db.close()
 
 
 @pytest.fixture
-@contextmanager
-def base_repo(base_dbconn):
-    with base_dbconn as db:
-        yield FileRepo(db), DirRepo(db)
+def frozen_now(monkeypatch):
+    """Stops the clock FileRepo stamps updated times with at FROZEN_NOW."""
+
+    class FrozenDT(dt):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromtimestamp(FROZEN_NOW, tz)
+
+    monkeypatch.setattr("lib.handler.file_repo.dt", FrozenDT)
+    return FROZEN_NOW
+
+
+@pytest.fixture(scope="class")
+def abc_repo(base_repo_template, clone_db):
+    """One FileRepo per test class holding files a, b & c with ids 1, 2 & 3.
+    Only for tests that read from its db without writing to it."""
+    db = clone_db(base_repo_template)
+    fr = FileRepo(db)
+    fr.add(list(FILES_AH[:3]))
+    yield fr
+    db.close()
 
 
 # TestFixtures
 class TestFixtures:
     """Tests this module's fixtures."""
 
-    def testTempDirContext(self):
-        """Tests the temp_dir_context fixture for read write operations with os module."""
-        with temp_dir_context() as tempdir:
-            assert os.path.isdir(tempdir)
-            with open(tempdir / "foobar.txt", "w") as f:
-                f.write("foobar")
-            with open(tempdir / "foobar.txt", "r") as f:
-                assert f.read() == "foobar"
-
-    def testTempDirContextCleanup(self):
-        """Ensure cleanup of temporary directory after context"""
-        with temp_dir_context() as tempdir:
-            with pytest.raises(FileNotFoundError):
-                with open(tempdir / "foobar.txt", "r") as f:
-                    f.read()
-        assert not os.path.isdir(tempdir)
-
     def testBaseDBConn(self, base_dbconn):
         """Tests the base_dbconn fixture."""
-        with base_dbconn as db:
-            assert db.root == db.path.parent
-            assert os.path.isfile(db.path)
-            assert os.path.isdir(db.root)
-            assert DBC.read_root(db.path) == db.root
-            assert DBC.is_scout_db_file(db.path)
+        db = base_dbconn
+        assert db.path == PP(MEMORY_PATH)
+        assert os.path.isdir(db.root)
+        assert db.table_exists("fs_meta")
+        with db.connect() as conn, db.connect() as again:
+            assert conn is again
 
     def testBaseRepo(self, base_repo):
         """Tests the base_repo fixture."""
-        with base_repo as (fr, dr):
-            assert fr.db == dr.db
-            assert fr.db is not None
-            assert fr.db.path is not None
-            assert fr.db.root is not None
-            assert fr.db.path == fr.db.root / ".scout.db"
+        fr, dr = base_repo
+        assert fr.db == dr.db
+        assert fr.db is not None
+        assert fr.db.path is not None
+        assert fr.db.root is not None
+        assert fr.db.path == PP(MEMORY_PATH)
+        # Each test gets its own empty copy of the template's tables
+        fr.add(File("a"))
+        with fr.db.connect() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM file").fetchone() == (1,)
+            assert conn.execute("SELECT COUNT(*) FROM dir").fetchone() == (0,)
+
+    def testAbcRepo(self, abc_repo):
+        """Tests the abc_repo fixture."""
+        assert [(f.id, f.path.name) for f in abc_repo.get()] == [
+            (1, "a"),
+            (2, "b"),
+            (3, "c"),
+        ]
 
 
 # TestInitUtils
@@ -105,22 +140,16 @@ class TestInitUtils:
             (6, "updated", "INTEGER", 0, None, 0),
         ]
 
-        with base_dbconn as db:
-            FileRepo.create_file_table(db)  # Act
-            with db.connect() as conn:
-                c = conn.cursor()
-                c.execute(query_table)
-                assert ("file",) in c.fetchall()  # Assert Table exists
+        db = base_dbconn
+        FileRepo.create_file_table(db)  # Act
+        with db.connect() as conn:
+            c = conn.cursor()
+            c.execute(query_table)
+            assert ("file",) in c.fetchall()  # Assert Table exists
 
-                # Assert schema
-                schema = c.execute(query_schema).fetchall()
-                assert len(schema) == len(expect)
-                assert schema[0] == expect[0]  # Assert column 0
-                assert schema[1] == expect[1]  # Assert column 1
-                assert schema[2] == expect[2]  # Assert column 2
-                assert schema[3] == expect[3]  # Assert column 3
-                assert schema[4] == expect[4]  # Assert column 4
-                assert schema[5] == expect[5]  # Assert column 5
+            # Assert schema
+            schema = c.execute(query_schema).fetchall()
+            assert schema == expect
 
 
 # TestInit
@@ -129,24 +158,24 @@ class TestInit:
 
     def testSetsMembers(self, base_dbconn):
         """Tests that __init__ sets members."""
-        with base_dbconn as db:
-            fr = FileRepo(db)
-            assert fr.db == db
+        db = base_dbconn
+        fr = FileRepo(db)
+        assert fr.db == db
 
     def testCallsTableExists(self, base_dbconn):
         """Tests that DBConnector.table_exists is called to check for table."""
-        with base_dbconn as db:
-            with patch(f"{MOD_DBC}.table_exists") as mock:
-                FileRepo(db)
-                mock.assert_called_once_with("file")
+        db = base_dbconn
+        with patch(f"{MOD_DBC}.table_exists") as mock:
+            FileRepo(db)
+            mock.assert_called_once_with("file")
 
     def testCallsCreateTable(self, base_dbconn):
         """Tests that create_file_table is called when table does not exist."""
-        with base_dbconn as db:
-            with patch(f"{MOD_DBC}.table_exists", return_value=False):
-                with patch(f"{MOD_FR}.create_file_table") as mock:
-                    FileRepo(db)
-                    mock.assert_called_once_with(db)
+        db = base_dbconn
+        with patch(f"{MOD_DBC}.table_exists", return_value=False):
+            with patch(f"{MOD_FR}.create_file_table") as mock:
+                FileRepo(db)
+                mock.assert_called_once_with(db)
 
 
 # TestSelectDirWhere
@@ -155,77 +184,87 @@ class TestSelectDirWhere:
 
     def testIdReturns(self, base_repo):
         """Tests that when an id is supplied, the query returns the correct dir."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("foo"))
-            dr.add(dir=Dir("bar"))
-            assert fr.select_dir_where(id=2) == (2, "bar")
+        fr, dr = base_repo
+        dr.add_many([Dir("foo"), Dir("bar")])
+        assert fr.select_dir_where(id=2) == (2, "bar")
 
     def testPathReturns(self, base_repo):
         """Tests that when a path is supplied, the query returns the correct dir."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("foo"))
-            dr.add(dir=Dir("bar"))
-            assert fr.select_dir_where(path="foo") == (1, "foo")
+        fr, dr = base_repo
+        dr.add_many([Dir("foo"), Dir("bar")])
+        assert fr.select_dir_where(path="foo") == (1, "foo")
 
     def testDirNotExists(self, base_repo):
         """Tests that when the dir does not exist, None is returned."""
-        with base_repo as (fr, _):
-            assert fr.select_dir_where(id=1) is None
+        fr, _ = base_repo
+        assert fr.select_dir_where(id=1) is None
 
     def testRaisesNoArgs(self, base_repo):
         """Tests that when no arguments are supplied, raises TypeError."""
-        with base_repo as (fr, _):
-            with pytest.raises(TypeError):
-                fr.select_dir_where()
+        fr, _ = base_repo
+        with pytest.raises(TypeError):
+            fr.select_dir_where()
 
 
 # TestSelectFileWhereQuery
 class TestSelectFilesQuery:
-    """Tests FileRepo.select_file_where_query builder method."""
+    """Tests FileRepo.select_file_where_query builder method.
+    It only builds the query, so only testQueryRuns needs a db."""
 
     EXPECT = "SELECT * FROM file WHERE"
 
-    def testRaiseOnNoArg(self, base_repo):
+    def testRaiseOnNoArg(self):
         """Tests that when no arguments are supplied, raises TypeError."""
-        with base_repo as (fr, _):
-            with pytest.raises(TypeError):
-                fr.select_files_where_query()
-
-    def testReturnOn1Args(self, base_repo):
-        """Tests that when only one argument is supplied, the query is correct."""
-        with base_repo as (fr, _):
-            fn = fr.select_files_where_query
-            assert fn(id=1) == f"{self.EXPECT} id = 1;"
-            assert fn(dir_id=1) == f"{self.EXPECT} dir_id = 1;"
-            assert fn(name="foo") == f"{self.EXPECT} name = 'foo';"
-            assert fn(md5="DEADBEEF") == f"{self.EXPECT} md5 = 'DEADBEEF';"
-            assert fn(mtime=42) == f"{self.EXPECT} mtime = 42;"
-            assert fn(updated=69) == f"{self.EXPECT} updated = 69;"
-
-    def testReturnAllArgs(self, base_repo):
-        """Tests that when all arguments are supplied, the query is correct."""
-        with base_repo as (fr, _):
-            fn = fr.select_files_where_query
-            query = fn(dir_id=1, name="foo", md5="CAFE", mtime=42, updated=69)
-            expect = f"{self.EXPECT} dir_id = 1 AND name = 'foo' AND md5 = 'CAFE' AND mtime = 42 AND updated = 69;"
-            assert query == expect
-
-    def testReturnIdOverrides(self, base_repo):
-        """Tests that when id is supplied, a single Where clause is returned."""
-        with base_repo as (fr, _):
-            fn = fr.select_files_where_query
-            query = fn(id=1, dir_id=2, md5="CAFE", mtime=42, updated=69)
-            assert query == f"{self.EXPECT} id = 1;"
-
-    def testReturnSomeArgs(self, base_repo):
-        """Tests that when some arguments are supplied, the query is correct."""
-        with base_repo as (fr, _):
-            fn = fr.select_files_where_query
-            query = fn(dir_id=1, mtime=42, updated=69)
-            expect = f"{self.EXPECT} dir_id = 1 AND mtime = 42 AND updated = 69;"
-            assert query == expect
-            query = fn(name="foo", mtime=42, md5="CAFE")
-            expect = f"{self.EXPECT} name = 'foo' AND mtime = 42 AND md5 = 'CAFE';"
+        with pytest.raises(TypeError):
+            FileRepo.select_files_where_query()
+
+    @pytest.mark.parametrize(
+        "kwargs,expect,params",
+        [
+            # Only one argument supplied
+            ({"id": 1}, "id = ?;", (1,)),
+            ({"dir_id": 1}, "dir_id = ?;", (1,)),
+            ({"name": "foo"}, "name = ?;", ("foo",)),
+            ({"md5": "DEADBEEF"}, "md5 = ?;", ("DEADBEEF",)),
+            ({"mtime": 42}, "mtime = ?;", (42,)),
+            ({"updated": 69}, "updated = ?;", (69,)),
+            # All arguments but id supplied
+            (
+                {"dir_id": 1, "name": "foo", "md5": "CAFE", "mtime": 42, "updated": 69},
+                "dir_id = ? AND name = ? AND md5 = ? AND mtime = ? AND updated = ?;",
+                (1, "foo", "CAFE", 42, 69),
+            ),
+            # When id is supplied, a single Where clause is returned
+            (
+                {"id": 1, "dir_id": 2, "md5": "CAFE", "mtime": 42, "updated": 69},
+                "id = ?;",
+                (1,),
+            ),
+            # Some arguments supplied, clauses follow argument order not call order
+            (
+                {"dir_id": 1, "mtime": 42, "updated": 69},
+                "dir_id = ? AND mtime = ? AND updated = ?;",
+                (1, 42, 69),
+            ),
+            (
+                {"name": "foo", "mtime": 42, "md5": "CAFE"},
+                "name = ? AND md5 = ? AND mtime = ?;",
+                ("foo", "CAFE", 42),
+            ),
+        ],
+    )
+    def testReturns(self, kwargs, expect, params):
+        """Tests that the query holds a WHERE clause per supplied argument,
+        each with a placeholder for its value in the returned params."""
+        query = FileRepo.select_files_where_query(**kwargs)
+        assert query == (f"{self.EXPECT} {expect}", params)
+
+    def testQueryRuns(self, abc_repo):
+        """Tests that the query & params execute as is on a file table."""
+        query, params = FileRepo.select_files_where_query(name="b", dir_id=0)
+        with abc_repo.db.connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        assert [row[:3] for row in rows] == [(2, 0, "b")]
 
 
 class TestAdd:
@@ -233,306 +272,314 @@ class TestAdd:
 
     def testAbsRelPathsSame(self, base_repo):
         """Tests that absolute and relative paths result in same file rows"""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("foo"))
-            # Even indices are absolute paths, odd are relative
-            files = [File("foo/bar.txt"), File(fr.db.root / "foo/bar.txt")]
-            files += [File("foo/baz.txt"), File(fr.db.root / "foo/baz.txt")]
-            stored_files = fr.add(files)
-            assert [f.id for f in stored_files] == [1, 2, 3, 4]
-            # Everything but the id & updated should be the same so set them equal
-            stored_files[0].id = stored_files[1].id
-            stored_files[2].id = stored_files[3].id
-            stored_files[0].updated = stored_files[1].updated
-            stored_files[2].updated = stored_files[3].updated
-            assert stored_files[0] == stored_files[1]
-            assert stored_files[2] == stored_files[3]
-            # Now do the same with the associated rows in the database
-            with fr.db.connect() as conn:
-                c = conn.cursor()
-                rows = c.execute("SELECT * FROM file").fetchall()
-                assert len(rows) == 4
-                # Again everything but the id & updated column should be the same
-                assert rows[0][1:-1] == rows[1][1:-1]
-                assert rows[2][1:-1] == rows[3][1:-1]
-
-    def testWithDirIdGiven(self, base_repo):
+        fr, dr = base_repo
+        dr.add(dir=Dir("foo"))
+        # Each file added by its relative then its absolute path
+        files = [
+            File(p)
+            for n in ("bar.txt", "baz.txt")
+            for p in (f"foo/{n}", fr.db.root / "foo" / n)
+        ]
+        stored_files = fr.add(files)
+        assert [f.id for f in stored_files] == [1, 2, 3, 4]
+        # Everything but the id & updated should be the same
+        invariant = lambda f: (f.path, f.dir_id, f.md5, f.size, f.mtime)
+        assert invariant(stored_files[0]) == invariant(stored_files[1])
+        assert invariant(stored_files[2]) == invariant(stored_files[3])
+        # Now do the same with the associated rows in the database
+        with fr.db.connect() as conn:
+            c = conn.cursor()
+            rows = c.execute("SELECT * FROM file").fetchall()
+            assert len(rows) == 4
+            # Again everything but the id & updated column should be the same
+            assert rows[0][1:-1] == rows[1][1:-1]
+            assert rows[2][1:-1] == rows[3][1:-1]
+
+    def testWithDirIdGiven(self, base_repo, frozen_now):
         """Tests that file table correct when adding with dir_id given.
         NOTE: This means dir_id should override dir in parent of path of file."""
-        with base_repo as (fr, dr):
-            updated = int(dt.now().timestamp())
-            dr.add(dir=Dir("test"))
-            dr.add(dir=Dir("foo"))
-            fr.add([File("foo/foo.txt", dir_id=2), File("test/test.txt", dir_id=1)])
-            with fr.db.connect() as conn:
-                c = conn.cursor()
-                rows = c.execute("SELECT * FROM file").fetchall()
-            assert len(rows) == 2
-            assert rows[0] == (1, 2, "foo.txt", None, None, None, updated)
-            assert rows[1] == (2, 1, "test.txt", None, None, None, updated)
-
-    def testDirIdOverridesPath(self, base_repo):
+        fr, dr = base_repo
+        updated = frozen_now
+        dr.add_many([Dir("test"), Dir("foo")])
+        fr.add([File("foo/foo.txt", dir_id=2), File("test/test.txt", dir_id=1)])
+        with fr.db.connect() as conn:
+            c = conn.cursor()
+            rows = c.execute("SELECT * FROM file").fetchall()
+        assert len(rows) == 2
+        assert rows[0] == (1, 2, "foo.txt", None, None, None, updated)
+        assert rows[1] == (2, 1, "test.txt", None, None, None, updated)
+
+    def testDirIdOverridesPath(self, base_repo, frozen_now):
         """Sometimes you might know the dir_id which saves querying the dir table.
         Thus it should override the dir in the path of the file."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("foo"))
-            dr.add(dir=Dir("baz"))
-            updated = int(dt.now().timestamp())
-            file = fr.add([File("baz/bar.txt", dir_id=1)])  # Note baz dir is dir_id=2
-            assert file[0].dir_id == 1
-            assert file[0].path == fr.db.root / "foo/bar.txt"
-            with fr.db.connect() as conn:
-                dir_row = conn.execute("SELECT * FROM file").fetchone()
-                assert dir_row == (1, 1, "bar.txt", None, None, None, updated)
-
-    def testWithoutDirId(self, base_repo):
+        fr, dr = base_repo
+        dr.add_many([Dir("foo"), Dir("baz")])
+        updated = frozen_now
+        file = fr.add([File("baz/bar.txt", dir_id=1)])  # Note baz dir is dir_id=2
+        assert file[0].dir_id == 1
+        assert file[0].path == fr.db.root / "foo/bar.txt"
+        with fr.db.connect() as conn:
+            dir_row = conn.execute("SELECT * FROM file").fetchone()
+            assert dir_row == (1, 1, "bar.txt", None, None, None, updated)
+
+    def testWithoutDirId(self, base_repo, frozen_now):
         """Tests that file table correct when adding without dir_id given."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("test"))
-            updated = int(dt.now().timestamp())
-            files = [File("root.txt"), File(fr.db.root / "hello"), File("test/foo.txt")]
-            files = fr.add(files)
-            with fr.db.connect() as conn:
-                c = conn.cursor()
-                rows = c.execute("SELECT * FROM file").fetchall()
-            assert len(rows) == 3
-            assert rows[0] == (1, 0, "root.txt", None, None, None, updated)
-            assert rows[1] == (2, 0, "hello", None, None, None, updated)
-            assert rows[2] == (3, 1, "foo.txt", None, None, None, updated)
-
-    def testRootPath(self, base_repo):
+        fr, dr = base_repo
+        dr.add(dir=Dir("test"))
+        updated = frozen_now
+        files = [File("root.txt"), File(fr.db.root / "hello"), File("test/foo.txt")]
+        files = fr.add(files)
+        with fr.db.connect() as conn:
+            c = conn.cursor()
+            rows = c.execute("SELECT * FROM file").fetchall()
+        assert len(rows) == 3
+        assert rows[0] == (1, 0, "root.txt", None, None, None, updated)
+        assert rows[1] == (2, 0, "hello", None, None, None, updated)
+        assert rows[2] == (3, 1, "foo.txt", None, None, None, updated)
+
+    def testRootPath(self, base_repo, frozen_now):
         """Tests that when a file is added with root path (relative and absolute) the dir_id column is 0."""
-        with base_repo as (fr, _):
-            updated = int(dt.now().timestamp())
-            fr.add([File(fr.db.root / "root.gpg"), File("hello.html")])
-            with fr.db.connect() as conn:
-                c = conn.cursor()
-                rows = c.execute("SELECT * FROM file").fetchall()
-            assert rows[0] == (1, 0, "root.gpg", None, None, None, updated)
-            assert rows[1] == (2, 0, "hello.html", None, None, None, updated)
+        fr, _ = base_repo
+        updated = frozen_now
+        fr.add([File(fr.db.root / "root.gpg"), File("hello.html")])
+        with fr.db.connect() as conn:
+            c = conn.cursor()
+            rows = c.execute("SELECT * FROM file").fetchall()
+        assert rows[0] == (1, 0, "root.gpg", None, None, None, updated)
+        assert rows[1] == (2, 0, "hello.html", None, None, None, updated)
 
     def testSinlgeFileSameAsList(self, base_repo):
         """Tests that adding a single file results in same thing as
         a list of one file."""
-        with base_repo as (fr, _):
-            single_file = fr.add(File("foo.txt"))
-            file_list = fr.add([File("foo.txt")])
-            # Change File obect's id and updated members to match
-            # They are expected to be different between successive adds
-            single_file[0].id = file_list[0].id
-            file_list[0].updated = single_file[0].updated
-            assert single_file == file_list
-            with fr.db.connect() as conn:
-                c = conn.cursor()
-                rows = c.execute("SELECT * FROM file").fetchall()
-                assert len(rows) == 2
-                # Same as before id (definitely) and updated (occasionally) are different
-                assert rows[0][1:-1] == rows[1][1:-1]
-
-    def testAllOptionalFileArgs(self, base_repo):
+        fr, _ = base_repo
+        single_file = fr.add(File("foo.txt"))
+        file_list = fr.add([File("foo.txt")])
+        # Change File obect's id and updated members to match
+        # They are expected to be different between successive adds
+        single_file[0].id = file_list[0].id
+        file_list[0].updated = single_file[0].updated
+        assert single_file == file_list
+        with fr.db.connect() as conn:
+            c = conn.cursor()
+            rows = c.execute("SELECT * FROM file").fetchall()
+            assert len(rows) == 2
+            # Same as before id (definitely) and updated (occasionally) are different
+            assert rows[0][1:-1] == rows[1][1:-1]
+
+    def testBatchAllOrNothing(self, base_repo):
+        """Tests that a batch of files is added in one transaction,
+        so a file with a missing dir, by path or by dir_id, leaves none
+        of the batch behind."""
+        fr, _ = base_repo
+        with pytest.raises(ValueError):
+            fr.add([File("a.txt"), File("nodir/b.txt")])
+        with pytest.raises(ValueError):
+            fr.add([File("a.txt"), File("b.txt", dir_id=42)])
+        with fr.db.connect() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM file").fetchone() == (0,)
+
+    def testAllOptionalFileArgs(self, base_repo, frozen_now):
         """Tests that all optional arguments are added to the file table."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("foo"))
-            # mtime should be epoch time integer for current time
-            path = fr.db.root / "foo/foo.txt"
-            mtime = dt.fromtimestamp(42)
-            md5 = HashMD5(hex="CAFE")
-            updated = int(dt.now().timestamp())
-            size = 4096
-            fr.add(File(path, dir_id=1, size=size, mtime=mtime, md5=md5))
-            with fr.db.connect() as conn:
-                c = conn.cursor()
-                rows = c.execute("SELECT * FROM file").fetchall()
-                assert len(rows) == 1
-                assert rows[0] == (1, 1, "foo.txt", "cafe", size, 42, updated)
+        fr, dr = base_repo
+        dr.add(dir=Dir("foo"))
+        # mtime should be epoch time integer for current time
+        path = fr.db.root / "foo/foo.txt"
+        mtime = dt.fromtimestamp(42)
+        md5 = HashMD5(hex="CAFE")
+        updated = frozen_now
+        size = 4096
+        fr.add(File(path, dir_id=1, size=size, mtime=mtime, md5=md5))
+        with fr.db.connect() as conn:
+            c = conn.cursor()
+            rows = c.execute("SELECT * FROM file").fetchall()
+            assert len(rows) == 1
+            assert rows[0] == (1, 1, "foo.txt", "cafe", size, 42, updated)
 
 
 class TestGet:
     """Tests FileRepo.get method."""
 
-    def testByName(self, base_repo):
-        """Tests that get returns the correct file by name."""
-        with base_repo as (fr, dr):
-            fr.add([File("a"), File("b"), File("c")])
-            assert fr.get(name="a")[0].id == 1
-            assert fr.get(name="b")[0].id == 2
-            assert fr.get(name__ne="c")[0].id == 1
-            assert fr.get(name__ne="c")[1].id == 2
-
-    def testById(self, base_repo):
-        """Tests that get returns the correct file by id."""
-        with base_repo as (fr, _):
-            fr.add([File("a"), File("b"), File("c")])
-            assert fr.get(id__ne=1)[0].path.name == "b"
-            assert fr.get(id__ne=1)[1].path.name == "c"
-            assert fr.get(id=2)[0].path.name == "b"
-            assert fr.get(id=3)[0].path.name == "c"
+    @pytest.mark.parametrize(
+        "kwargs,expect",
+        [
+            ({"name": "a"}, "a"),
+            ({"name": "b"}, "b"),
+            ({"name__ne": "c"}, "ab"),
+            ({"id": 2}, "b"),
+            ({"id": 3}, "c"),
+            ({"id__ne": 1}, "bc"),
+            ({}, "abc"),  # No filter returns every file
+            ({"name": "d"}, ""),  # No matches return an empty list
+            ({"id": 4}, ""),
+            ({"updated": 100}, ""),
+            ({"md5": "deadbeef"}, ""),
+            ({"dir_id": 2}, ""),
+        ],
+    )
+    def testByNameAndId(self, abc_repo, kwargs, expect):
+        """Tests that get returns the correct files by name & id,
+        all files with no filters & an empty list when nothing matches.
+        expect holds the names of the files, whose ids follow name order."""
+        files = abc_repo.get(**kwargs)
+        assert [f.path.name for f in files] == list(expect)
+        assert [f.id for f in files] == ["abc".index(n) + 1 for n in expect]
 
     def testByDirId(self, base_repo):
         """Tests that get returns the correct file by dir_id foreign key."""
         """Essentially what you'd do to find files in same directory."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("foo"))
-            dr.add(dir=Dir("bar"))
-            fa, fc = File("a", dir_id=1), File("c", dir_id=1)
-            fb, fx = File("b", dir_id=2), File("r", dir_id=0)
-            fr.add([fa, fb, fc, fx])
-            assert len(fr.get(dir_id=1)) == 2
-            assert fr.get(dir_id=1)[0].path == fr.db.root / "foo/a"
-            assert fr.get(dir_id=1)[1].path == fr.db.root / "foo/c"
-            assert fr.get(dir_id=2)[0].path == fr.db.root / "bar/b"
-            assert fr.get(dir_id=0)[0].path == fr.db.root / "r"
-            assert fr.get(dir_id__ne=1)[0].path == fr.db.root / "bar/b"
-            assert fr.get(dir_id__ne=1)[1].path == fr.db.root / "r"
+        fr, dr = base_repo
+        dr.add_many([Dir("foo"), Dir("bar")])
+        fa, fc = File("a", dir_id=1), File("c", dir_id=1)
+        fb, fx = File("b", dir_id=2), File("r", dir_id=0)
+        fr.add([fa, fb, fc, fx])
+        root = fr.db.root
+        result = fr.get(dir_id=1)
+        assert len(result) == 2
+        assert result[0].path == root / "foo/a"
+        assert result[1].path == root / "foo/c"
+        assert fr.get(dir_id=2)[0].path == root / "bar/b"
+        assert fr.get(dir_id=0)[0].path == root / "r"
+        result = fr.get(dir_id__ne=1)
+        assert result[0].path == root / "bar/b"
+        assert result[1].path == root / "r"
 
     def testByPath(self, base_repo):
         """Tests that get returns the correct file by path."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("a"))
-            dr.add(dir=Dir("a/a"))
-            fr.add(File("a/a/a"))
-            assert len(fr.get(path="a/a/a")) == 1
-            assert fr.get(path="a/a/a")[0].id == 1
-            assert fr.get(path="a/a/a")[0].dir_id == 2
-            assert fr.get(path="a/a/a")[0].path == fr.db.root / "a/a/a"
+        fr, dr = base_repo
+        dr.add_many([Dir("a"), Dir("a/a")])
+        fr.add(File("a/a/a"))
+        result = fr.get(path="a/a/a")
+        assert len(result) == 1
+        assert result[0].id == 1
+        assert result[0].dir_id == 2
+        assert result[0].path == fr.db.root / "a/a/a"
 
     def testBySizeBetween(self, base_repo):
         """Test that you can chain </= and >/= together to
         check for range of size and test size column."""
-        with base_repo as (fr, _):
-            sizes = [256, 512, 1024, 2048, 4096]
-            names = ["eight", "nine", "ten", "eleven", "twelve"]
-            files = [File(n, size=s) for n, s in zip(names, sizes)]
-            fr.add(files)
-            assert fr.get(id=1)[0].size == 256
-            assert len(fr.get(size=256)) == 1
-            assert len(fr.get(size__gt=512, size__lt=5000)) == 3
-            assert len(fr.get(size__ge=512, size__lt=1024)) == 1
-            assert fr.get(size__ge=512, size__lt=1024)[0].path.name == "nine"
-            assert fr.get(size__ge=512, size__lt=1024)[0].id == 2
+        fr, _ = base_repo
+        sizes = [256, 512, 1024, 2048, 4096]
+        names = ["eight", "nine", "ten", "eleven", "twelve"]
+        files = [File(n, size=s) for n, s in zip(names, sizes)]
+        fr.add(files)
+        assert fr.get(id=1)[0].size == 256
+        assert len(fr.get(size=256)) == 1
+        assert len(fr.get(size__gt=512, size__lt=5000)) == 3
+        result = fr.get(size__ge=512, size__lt=1024)
+        assert len(result) == 1
+        assert result[0].path.name == "nine"
+        assert result[0].id == 2
 
     def testByMtimeAndGreaterThan(self, base_repo):
         """Tests that get returns the correct file by mtime.
         Also tests the __ge, __gt operators."""
-        with base_repo as (fr, _):
-            mtimes = [100, 200, 300, 400, 500, 600, 700, 800]
-            mtimes = [dt.fromtimestamp(m) for m in mtimes]
-            files = ["a", "b", "c", "d", "e", "f", "g", "h"]
-            files = [File(f, mtime=m) for f, m in zip(files, mtimes)]
-            fr.add(files)
-            assert len(fr.get(mtime=99)) == 0
-            assert len(fr.get(mtime=100)) == 1
-            assert fr.get(mtime=100)[0].path.name == "a"
-            assert fr.get(mtime=100)[0].id == 1
-            assert fr.get(mtime=100)[0].mtime == dt.fromtimestamp(100)
-            assert len(fr.get(mtime__ge=700)) == 2
-            assert fr.get(mtime__ge=700)[0].id == 7
-            assert fr.get(mtime__ge=700)[0].path.name == "g"
-            assert fr.get(mtime__ge=700)[1].path.name == "h"
-            assert fr.get(mtime__ge=700) == fr.get(mtime__gt=600)
-            assert len(fr.get(mtime__gt=100)) == 7
+        fr, _ = base_repo
+        fr.add(list(FILES_AH_MTIME))
+        assert len(fr.get(mtime=99)) == 0
+        result = fr.get(mtime=100)
+        assert len(result) == 1
+        assert result[0].path.name == "a"
+        assert result[0].id == 1
+        assert result[0].mtime == dt.fromtimestamp(100)
+        result = fr.get(mtime__ge=700)
+        assert len(result) == 2
+        assert result[0].id == 7
+        assert result[0].path.name == "g"
+        assert result[1].path.name == "h"
+        assert result == fr.get(mtime__gt=600)
+        assert len(fr.get(mtime__gt=100)) == 7
 
     def testByUpdatedAndLessThan(self, base_repo):
         """Tests that get returns correct file objects by updated time column.
         Also tests the __le, __lt operators.
         Does so by adding files then altering the updated time column in sqlite."""
-        ups = [100, 200, 300, 400, 500, 600, 700, 800]
-        files = ["a", "b", "c", "d", "e", "f", "g", "h"]
-        files = [File(f) for f in files]
-        with base_repo as (fr, _):
-            with fr.db.connect() as conn:
-                fr.add(files)
-                c = conn.cursor()
-                for i, up in enumerate(ups):
-                    c.execute(f"UPDATE file SET updated = {up} WHERE id = {i+1}")
-                conn.commit()
-            assert len(fr.get(updated=101)) == 0
-            assert len(fr.get(updated=100)) == 1
-            assert fr.get(updated=100)[0].path.name == "a"
-            assert fr.get(updated=100)[0].id == 1
-            assert len(fr.get(updated__le=300)) == 3
-            assert fr.get(updated__le=300)[0].id == 1
-            assert fr.get(updated__le=300)[0].path.name == "a"
-            assert fr.get(updated__le=300)[1].path.name == "b"
-            assert fr.get(updated__le=300)[2].path.name == "c"
-            assert len(fr.get(updated__le=700)) == 7
-            assert fr.get(updated__le=700) == fr.get(updated__lt=800)
+        fr, _ = base_repo
+        with fr.db.connect() as conn:
+            fr.add(list(FILES_AH))
+            q = "UPDATE file SET updated = ? WHERE id = ?"
+            conn.executemany(q, [(up, i + 1) for i, up in enumerate(TIMES)])
+            conn.commit()
+        assert len(fr.get(updated=101)) == 0
+        result = fr.get(updated=100)
+        assert len(result) == 1
+        assert result[0].path.name == "a"
+        assert result[0].id == 1
+        result = fr.get(updated__le=300)
+        assert len(result) == 3
+        assert result[0].id == 1
+        assert result[0].path.name == "a"
+        assert result[1].path.name == "b"
+        assert result[2].path.name == "c"
+        result = fr.get(updated__le=700)
+        assert len(result) == 7
+        assert result == fr.get(updated__lt=800)
 
     def testByMd5AndNull(self, base_repo):
         """Tests that get returns the correct file by md5 hash.
         Also tests the __null operator since this is a likely column to use it on."""
-        with base_repo as (fr, _):
-            md5s = ["deadbeef", "cafefeed", "00", "12345678"]
-            files = [File(str(m), md5=HashMD5(hex=m)) for m in md5s]
-            files += [File("none")]
-            fr.add(files)
-            assert len(fr.get(md5="deadbeef")) == 1
-            assert fr.get(md5="deadbeef")[0].path.name == "deadbeef"
-            assert fr.get(md5="cafefeed")[0].path.name == "cafefeed"
-            assert fr.get(md5="00")[0].path.name == "00"
-            assert fr.get(md5="12345678")[0].path.name == "12345678"
-            assert fr.get(md5__null=True)[0].path.name == "none"
-            assert len(fr.get(md5__null=False)) == 4
-
-    def testNoFilter(self, base_repo):
-        """Tests that get returns all files when no filters are applied."""
-        with base_repo as (fr, _):
-            fr.add([File("a"), File("b"), File("c")])
-            assert len(fr.get()) == 3
-
-    def testEmptyResult(self, base_repo):
-        """Tests that queries with no matches returns empty list."""
-        with base_repo as (fr, _):
-            fr.add([File("a"), File("b"), File("c")])
-            assert len(fr.get(name="d")) == 0
-            assert len(fr.get(id=4)) == 0
-            assert len(fr.get(updated=100)) == 0
-            assert len(fr.get(md5="deadbeef")) == 0
-            assert len(fr.get(dir_id=2)) == 0
+        fr, _ = base_repo
+        fr.add(list(FILES_MD5))
+        result = fr.get(md5="deadbeef")
+        assert len(result) == 1
+        assert result[0].path.name == "deadbeef"
+        assert fr.get(md5="cafefeed")[0].path.name == "cafefeed"
+        assert fr.get(md5="00")[0].path.name == "00"
+        assert fr.get(md5="12345678")[0].path.name == "12345678"
+        assert fr.get(md5__null=True)[0].path.name == "none"
+        assert len(fr.get(md5__null=False)) == 4
 
     def testManyFilters(self, base_repo):
         """Tests that get returns correct file with many filters applied."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("foo"))
-            dr.add(dir=Dir("bar"))
-            dr.add(dir=Dir("baz"))
-            fr.add(
-                [
-                    File("foo/a.txt"),
-                    File("bar/b.txt"),
-                    File("baz/c.txt"),
-                    File("a.txt"),
-                    File("b.txt"),
-                ]
-            )
-            assert fr.get(name="a.txt", dir_id=1)[0].path.name == "a.txt"
-            assert fr.get(name="b.txt", dir_id=2)[0].path.name == "b.txt"
-            assert fr.get(name="c.txt", dir_id=3)[0].path.name == "c.txt"
-            assert fr.get(name="a", dir_id=2) == []
-            assert fr.get(name="b", dir_id=1) == []
-            assert fr.get(name="c", dir_id=1) == []
-            root = fr.db.root
-            assert fr.get(name="a.txt", dir_id=0)[0].path == root / "a.txt"
-            assert fr.get(name="b.txt", dir_id=2)[0].path == root / "bar/b.txt"
-
-    def testAllFilters(self, base_repo):
+        fr, dr = base_repo
+        dr.add_many([Dir("foo"), Dir("bar"), Dir("baz")])
+        fr.add(
+            [
+                File("foo/a.txt"),
+                File("bar/b.txt"),
+                File("baz/c.txt"),
+                File("a.txt"),
+                File("b.txt"),
+            ]
+        )
+        assert fr.get(name="a.txt", dir_id=1)[0].path.name == "a.txt"
+        assert fr.get(name="b.txt", dir_id=2)[0].path.name == "b.txt"
+        assert fr.get(name="c.txt", dir_id=3)[0].path.name == "c.txt"
+        assert fr.get(name="a", dir_id=2) == []
+        assert fr.get(name="b", dir_id=1) == []
+        assert fr.get(name="c", dir_id=1) == []
+        root = fr.db.root
+        assert fr.get(name="a.txt", dir_id=0)[0].path == root / "a.txt"
+        assert fr.get(name="b.txt", dir_id=2)[0].path == root / "bar/b.txt"
+
+    def testAllFilters(self, base_repo, frozen_now):
         """Tests that get returns correct file with all filters applied."""
-        with base_repo as (fr, dr):
-            dr.add(dir=Dir("foo"))
-            dr.add(dir=Dir("foo/bar"))
-            path = fr.db.root / "foo/bar/baz.txt"
-            md5 = HashMD5(hex="cafe")
-            size = 4096
-            mtime = dt.fromtimestamp(42)
-            up = dt.now().replace(microsecond=0)
-            fr.add(File(path, md5=md5, size=size, mtime=mtime))
-            result = fr.get(path="foo/bar/baz.txt", dir_id=2, md5="cafe", mtime=42)
-            assert len(result) == 1
-            result = result[0]
-            assert result.id == 1
-            assert result.dir_id == 2
-            assert result.path == path
-            assert result.md5 == str(md5)
-            assert result.size == size
-            assert result.mtime == mtime
-            assert result.updated - up < td(seconds=1)
+        fr, dr = base_repo
+        dr.add_many([Dir("foo"), Dir("foo/bar")])
+        path = fr.db.root / "foo/bar/baz.txt"
+        md5 = HashMD5(hex="cafe")
+        size = 4096
+        mtime = dt.fromtimestamp(42)
+        fr.add(File(path, md5=md5, size=size, mtime=mtime))
+        result = fr.get(path="foo/bar/baz.txt", dir_id=2, md5="cafe", mtime=42)
+        assert len(result) == 1
+        result = result[0]
+        assert result.id == 1
+        assert result.dir_id == 2
+        assert result.path == path
+        assert result.md5 == str(md5)
+        assert result.size == size
+        assert result.mtime == mtime
+        assert result.updated == dt.fromtimestamp(frozen_now)
+
+    def testBulkAddThenGet(self, base_repo):
+        """Tests adding & getting back a scan-sized batch of files.
+        Large enough that add or get going quadratic shows up in test times."""
+        fr, dr = base_repo
+        dr.add_many([Dir("foo"), Dir("bar")])
+        names = [f"f{i}.txt" for i in range(BULK_SIZE)]
+        added = fr.add([File(f"foo/{n}") for n in names] + [File("bar/x.txt")])
+        assert len(added) == BULK_SIZE + 1
+        result = fr.get(dir_id=1)
+        assert [f.id for f in result] == list(range(1, BULK_SIZE + 1))
+        assert [f.path.name for f in result] == names
+        assert [f.path.name for f in fr.get(dir_id=2)] == ["x.txt"]
@@ -61,6 +61,15 @@ def test_directory_eq():
     assert Dir.from_path("/test/e", id=42) != Dir.from_path("/test/e")
 
 
+def test_directory_slots():
+    dir = Dir.from_path("/test/a", id=1)
+    assert not hasattr(dir, "__dict__")
+    dir.id = 2  # Slotted members stay assignable
+    assert dir == Dir.from_path("/test/a", id=2)
+    with pytest.raises(AttributeError):
+        dir.depth = 1  # type: ignore
+
+
 # Test section for standard constructor for File
 @pytest.fixture
 def mock_file():
@@ -68,33 +77,3 @@ def mock_file():
         # Setup mock to return a File instance w predefined attrs
         mock_file.return_value = mock_file
         yield mock_file
-
-
-# @pytest.mark.parametrize(
-#     "path",
-#     [("/"), ("/home/user/Documents"), ("relative/path")],
-# )
-# def test_dirtreenode_mkroot(path):
-#     # Arrange
-#     rootdir = Dir.from_path(path)
-#     # Act
-#     root = DirTreeNode.mkroot(rootdir)
-#     # Assert
-#     assert root.dir.path == path
-#     assert root.dir == rootdir
-#     assert root.parent is None
-#     assert root.subdirs == []
-#     assert root.depth == 0
-#
-#
-# def test_dirtreenode_init_defaults():
-#     dir = Dir.from_path("/")
-#     node_all_defaults = DirTreeNode(dir=dir)
-#     assert node_all_defaults.dir == dir
-#     assert node_all_defaults.dir.path == "/"
-#     assert node_all_defaults.parent is None
-#     assert node_all_defaults.subdirs == []
-#     assert node_all_defaults.depth == 0
-#
-#
-# # def test_dirtreenode_mkroot